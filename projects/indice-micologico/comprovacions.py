@@ -0,0 +1,212 @@
+"""
+Comprovacions del client de Meteocat contra un servidor HTTP local que fa
+de l'API (no cal clau ni connexió): quantes peticions es fan i com es
+reintenten.
+
+Cada comprovació torna la llista d'errors trobats; el script surt amb codi
+1 si alguna falla.
+
+Ús: python comprovacions.py [nom ...]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import requests  # noqa: E402
+
+from meteocat_client import MeteocatClient  # noqa: E402
+
+
+class ServidorProva:
+    """
+    Servidor HTTP local en un fil que respon amb `resposta(cami, params, n)`
+    -> (codi, capçaleres, cos JSON), on n és el número de petició (des de 0),
+    i desa cada petició rebuda com a (camí, params)
+    """
+
+    def __init__(self, resposta):
+        self.resposta = resposta
+        self.peticions = []
+        self._lock = threading.Lock()
+        servidor = self
+
+        class Gestor(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {clau: valors[0] for clau, valors in parse_qs(url.query).items()}
+                with servidor._lock:
+                    n = len(servidor.peticions)
+                    servidor.peticions.append((url.path, params))
+                codi, capcaleres, cos = servidor.resposta(url.path, params, n)
+                dades = json.dumps(cos).encode()
+                self.send_response(codi)
+                for clau, valor in capcaleres.items():
+                    self.send_header(clau, valor)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(dades)))
+                self.end_headers()
+                self.wfile.write(dades)
+
+            def log_message(self, *args):
+                pass
+
+        self._http = ThreadingHTTPServer(('127.0.0.1', 0), Gestor)
+        self.url = f"http://127.0.0.1:{self._http.server_address[1]}"
+        self._fil = threading.Thread(target=self._http.serve_forever, daemon=True)
+
+    def __enter__(self) -> 'ServidorProva':
+        self._fil.start()
+        return self
+
+    def __exit__(self, *excepcio):
+        self._http.shutdown()
+        self._http.server_close()
+
+
+def _client(servidor, **opcions) -> MeteocatClient:
+    """Client contra el servidor local, sense quota de peticions"""
+    return MeteocatClient(api_key='prova', base_url=servidor.url,
+                          peticions_per_segon=None, **opcions)
+
+
+def _estadistics(cami, params, n):
+    """Un mes d'estadístics diaris (dies 1 a 28) d'una estació o de dues"""
+    codis = [params['codiEstacio']] if 'codiEstacio' in params else ['XO', 'XL']
+    valors = [{'data': f"{params['any']}-{params['mes']}-{dia:02d}Z", 'valor': float(dia)}
+              for dia in range(1, 29)]
+    return 200, {}, [{'codiEstacio': codi, 'valors': valors} for codi in codis]
+
+
+def estadistics_en_bloc():
+    """obtenir_estadistics_diaris: una sola petició per estació, variable i mes"""
+    errors = []
+    inici, fi = date(2024, 9, 15), date(2024, 11, 10)
+    mesos = [('2024', '09'), ('2024', '10'), ('2024', '11')]
+    variables = ['PPT', 'TM']
+    codis_variables = {'PPT': '1300', 'TM': '1000'}
+
+    # (codis d'estacions demanats, estacions que han de sortir)
+    casos = [(['XO', 'XL'], ['XO', 'XL']), (None, ['XO', 'XL'])]
+    for codis, estacions in casos:
+        nom = 'xarxa' if codis is None else 'estacions'
+        with ServidorProva(_estadistics) as servidor, _client(servidor, workers=4) as client:
+            dades = client.obtenir_estadistics_diaris(codis, inici, fi, variables)
+
+        esperades = sorted((f"/variables/estadistics/diaris/{codis_variables[variable]}",
+                            codi, any, mes)
+                           for codi in (codis or [None]) for variable in variables
+                           for any, mes in mesos)
+        rebudes = sorted((cami, params.get('codiEstacio'), params.get('any'), params.get('mes'))
+                         for cami, params in servidor.peticions)
+        if rebudes != esperades:
+            errors.append(f"{nom}: {len(rebudes)} peticions en lloc de {len(esperades)} "
+                          "(una per estació, variable i mes)")
+        if sorted(dades) != sorted(estacions):
+            errors.append(f"{nom}: estacions {sorted(dades)} en lloc de {sorted(estacions)}")
+            continue
+        dies = (date(2024, 9, 28) - inici).days + 1 + 28 + (fi - date(2024, 11, 1)).days + 1
+        for estacio, df in dades.items():
+            if len(df) != dies * len(variables):
+                errors.append(f"{nom}: {estacio} té {len(df)} files en lloc de {dies * len(variables)}")
+            elif df['data'].min() < inici or df['data'].max() > fi:
+                errors.append(f"{nom}: {estacio} té dies fora del període")
+    return errors
+
+
+def _reintents(respostes, **opcions):
+    """
+    Demana les metadades a un servidor que torna (codi, capçaleres) de
+    `respostes` per ordre (i 200 quan s'acaben): (peticions rebudes, segons,
+    excepció o None, estadístiques del client)
+    """
+    def resposta(cami, params, n):
+        codi, capcaleres = respostes[n] if n < len(respostes) else (200, {})
+        return codi, capcaleres, [{'codi': 'XO'}] if codi == 200 else {'message': 'error'}
+
+    excepcio = None
+    with ServidorProva(resposta) as servidor, _client(servidor, **opcions) as client:
+        inici = time.monotonic()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):  # Els errors esperats
+                client.obtenir_metadades_estacions()
+        except requests.exceptions.RequestException as e:
+            excepcio = e
+        segons = time.monotonic() - inici
+    return len(servidor.peticions), segons, excepcio, client.estadistiques
+
+
+def reintents():
+    """_make_request: reintenta 429/5xx respectant Retry-After (fins a backoff_max) i no els 4xx"""
+    errors = []
+    # Sense Retry-After l'espera seria de mil·lisegons (backoff=0.01)
+    rapid = {'reintents': 3, 'backoff': 0.01, 'backoff_max': 5.0}
+
+    peticions, segons, excepcio, estadistiques = _reintents(
+        [(429, {'Retry-After': '0.5'}), (503, {'Retry-After': '0.5'})], **rapid)
+    if excepcio is not None or peticions != 3:
+        errors.append(f"429 i 503 transitoris: {peticions} peticions ({excepcio}) en lloc de 3 i èxit")
+    elif segons < 1.0:
+        errors.append(f"no respecta Retry-After: {segons:.2f}s en lloc d'1s com a mínim")
+    if estadistiques['reintents'] != 2 or estadistiques['errors'] != 0:
+        errors.append(f"estadístiques incorrectes després de 2 reintents: {estadistiques}")
+
+    peticions, segons, excepcio, _ = _reintents([(503, {'Retry-After': '60'})],
+                                                **{**rapid, 'backoff_max': 0.3})
+    if excepcio is not None or peticions != 2:
+        errors.append(f"Retry-After llarg: {peticions} peticions ({excepcio}) en lloc de 2 i èxit")
+    elif segons > 2.0:
+        errors.append(f"Retry-After no es limita a backoff_max: {segons:.2f}s")
+
+    peticions, _, excepcio, estadistiques = _reintents([(404, {})] * 5, **rapid)
+    if not isinstance(excepcio, requests.exceptions.HTTPError) or peticions != 1:
+        errors.append(f"404: {peticions} peticions ({excepcio!r}) en lloc d'1 i HTTPError")
+    if estadistiques['errors'] != 1:
+        errors.append(f"404: {estadistiques['errors']} errors comptats en lloc d'1")
+
+    peticions, _, excepcio, _ = _reintents([(503, {})] * 10, **rapid)
+    if not isinstance(excepcio, requests.exceptions.HTTPError) or peticions != rapid['reintents'] + 1:
+        errors.append(f"503 persistent: {peticions} peticions ({excepcio!r}) en lloc de "
+                      f"{rapid['reintents'] + 1} i HTTPError")
+    return errors
+
+
+# Comprovacions disponibles: funció () -> llista d'errors
+COMPROVACIONS = {
+    'estadistics_en_bloc': estadistics_en_bloc,
+    'reintents': reintents,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('noms', nargs='*', default=list(COMPROVACIONS),
+                        help=f"comprovacions a executar (opcions: {', '.join(COMPROVACIONS)})")
+    args = parser.parse_args()
+    desconegudes = set(args.noms) - set(COMPROVACIONS)
+    if desconegudes:
+        parser.error(f"comprovacions desconegudes: {', '.join(sorted(desconegudes))} "
+                     f"(opcions: {', '.join(COMPROVACIONS)})")
+
+    total = 0
+    for nom in args.noms:
+        errors = COMPROVACIONS[nom]()
+        total += len(errors)
+        print(f"{nom:<24} {'OK' if not errors else 'ERROR'}")
+        for error in errors:
+            print(f"  {error}")
+    return 1 if total else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
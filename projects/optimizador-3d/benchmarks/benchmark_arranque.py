@@ -0,0 +1,92 @@
+"""
+Mide el tiempo de arranque del optimizador y vigila que no vuelva a cargar
+la pila de dibujo al importarse.
+
+Cada medida es un proceso nuevo de Python (la caché de módulos no ayuda) y se
+toma la mediana de varias repeticiones. Se informa del coste propio del módulo
+descontando el de importar NumPy, que es una dependencia obligatoria.
+
+Falla (código de salida 1) si:
+- importar el módulo u optimizar un pedido pequeño carga matplotlib o
+  mpl_toolkits, o
+- el coste propio del módulo supera --limite-ms.
+
+Uso: python benchmark_arranque.py [--repeticiones 7] [--limite-ms 150]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+from comun import RUTA_OPTIMIZADOR
+
+_CARGAR = (
+    "import importlib.util, sys\n"
+    f"spec = importlib.util.spec_from_file_location('optimizador_3d', {RUTA_OPTIMIZADOR!r})\n"
+    "modulo = importlib.util.module_from_spec(spec)\n"
+    "spec.loader.exec_module(modulo)\n"
+)
+
+_OPTIMIZAR = (
+    "modulo.Optimizador3D(modulo.Bloque(200, 118, 180)).optimizar(modulo.cargar_piezas_ejemplo())\n"
+)
+
+_PILA_DIBUJO = (
+    "cargados = sorted({m.split('.')[0] for m in sys.modules} & {'matplotlib', 'mpl_toolkits'})\n"
+    "print(','.join(cargados))\n"
+)
+
+CASOS = {
+    'numpy': "import numpy\n",
+    'importar': _CARGAR,
+    'importar+optimizar': _CARGAR + _OPTIMIZAR,
+}
+
+
+def medir(codigo, repeticiones):
+    """Mediana del tiempo de pared de ejecutar el código en un proceso nuevo"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, '-c', codigo], check=True, stdout=subprocess.DEVNULL)
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def pila_dibujo_cargada(codigo):
+    """Paquetes de dibujo presentes en sys.modules tras ejecutar el código"""
+    salida = subprocess.run([sys.executable, '-c', codigo + _PILA_DIBUJO], check=True,
+                            capture_output=True, text=True).stdout.strip()
+    return salida.split(',') if salida else []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=7)
+    parser.add_argument('--limite-ms', type=float, default=150.0,
+                        help='coste máximo del módulo por encima de importar NumPy')
+    args = parser.parse_args()
+
+    fallos = []
+    for nombre in ('importar', 'importar+optimizar'):
+        cargados = pila_dibujo_cargada(CASOS[nombre])
+        if cargados:
+            fallos.append(f"'{nombre}' carga {', '.join(cargados)}")
+
+    tiempos = {nombre: medir(codigo, args.repeticiones) for nombre, codigo in CASOS.items()}
+    for nombre, tiempo in tiempos.items():
+        print(f"{nombre:<20} {tiempo * 1000:8.1f} ms")
+    propio = (tiempos['importar'] - tiempos['numpy']) * 1000
+    print(f"{'coste propio':<20} {propio:8.1f} ms (límite {args.limite_ms:.0f} ms)")
+    if propio > args.limite_ms:
+        fallos.append(f"el módulo añade {propio:.0f} ms al arranque")
+
+    for fallo in fallos:
+        print(f"FALLO: {fallo}")
+    return 1 if fallos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
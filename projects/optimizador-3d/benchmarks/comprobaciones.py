@@ -0,0 +1,318 @@
+"""
+Comprobaciones de coherencia del optimizador que no se ven en las métricas
+de los benchmarks (resultados que parecen buenos pero con estado corrupto).
+
+Cada comprobación devuelve la lista de fallos encontrados; el script sale
+con código 1 si alguna falla.
+
+Uso: python comprobaciones.py [nombre ...]
+"""
+
+import argparse
+import multiprocessing
+import sys
+
+from comun import cargar_optimizador, piezas_aleatorias
+
+
+def _huecos_guillotina_coherentes(gestor):
+    """Fallos si los huecos listados no son exactamente las hojas libres del árbol"""
+    fallos = []
+    for fila, hoja in enumerate(gestor._nodos):
+        if hoja.fila != fila:
+            fallos.append(f"la hoja de la fila {fila} cree estar en la fila {hoja.fila}")
+        if not hoja.libre or hoja.hijos is not None:
+            fallos.append(f"la fila {fila} es una hoja ocupada o cortada")
+    libres = {(*h.lo, *(h.hi[i] - h.lo[i] for i in range(3))) for h in gestor.hojas_libres()
+              if min(h.hi[i] - h.lo[i] for i in range(3)) >= gestor.lado_minimo}
+    listados = set(gestor.cajas.tolist())
+    if listados != libres:
+        fallos.append(f"{len(listados ^ libres)} huecos no coinciden con las hojas libres")
+    return fallos
+
+
+def copia_guillotina(modulo):
+    """Bloque.copiar con guillotina: la copia sigue coherente al colocar más piezas"""
+    fallos = []
+    piezas = piezas_aleatorias(modulo, 40, 10, 40, 3)
+    bloque = modulo.Bloque(120, 100, 120, gestor_huecos='guillotina')
+    optimizador = modulo.Optimizador3D(bloque)
+    optimizador.optimizar(piezas[:15])
+    copia = bloque.copiar()
+    fallos += [f"copia: {f}" for f in _huecos_guillotina_coherentes(copia.gestor_huecos)]
+    if set(copia.gestor_huecos.cajas.tolist()) != set(bloque.gestor_huecos.cajas.tolist()):
+        fallos.append("la copia no tiene los mismos huecos que el original")
+
+    optimizador.bloque = copia
+    optimizador.agregar(piezas[15:])
+    fallos += [f"copia tras agregar: {f}" for f in _huecos_guillotina_coherentes(copia.gestor_huecos)]
+    fallos += [f"original: {f}" for f in _huecos_guillotina_coherentes(bloque.gestor_huecos)]
+    return fallos
+
+
+def _avisos_reempaquetado(modulo, piezas, criterio, quitar):
+    """
+    Fallos en los avisos de al_colocar al retirar piezas con reempaquetado:
+    la última posición avisada de cada pieza debe ser la definitiva y no
+    debe haber avisos repetidos ni de piezas que no han quedado colocadas
+    (salvo las retiradas). Devuelve también si el reempaquetado se descartó.
+    """
+    fallos, avisos = [], []
+    bloque = modulo.Bloque(100, 80, 90)
+    avisar = lambda pieza: avisos.append(modulo.Optimizador3D._huella(pieza))
+    bloque.al_colocar.append(avisar)
+    optimizador = modulo.Optimizador3D(bloque, criterio, umbral_reempaquetado=100)
+    optimizador.optimizar(piezas)
+    retiradas = [bloque.piezas_colocadas[i] for i in quitar]
+    optimizador.retirar(retiradas)
+    descartado = optimizador.bloque is not bloque
+
+    if avisar not in optimizador.bloque.al_colocar:
+        fallos.append("el bloque final ya no avisa de las colocaciones")
+    if len(set(avisos)) != len(avisos):
+        fallos.append(f"{len(avisos) - len(set(avisos))} avisos repetidos")
+    ultimo = {aviso[0]: aviso for aviso in avisos}
+    definitivas = {modulo.Optimizador3D._huella(p) for p in optimizador.bloque.piezas_colocadas}
+    colocadas = {huella[0] for huella in definitivas}
+    if {ultimo[i] for i in colocadas if i in ultimo} != definitivas:
+        fallos.append("la última posición avisada no es la definitiva en "
+                      f"{len(definitivas - set(ultimo.values()))} piezas")
+    sobrantes = set(ultimo) - colocadas - {id(p.origen or p) for p in retiradas}
+    if sobrantes:
+        fallos.append(f"{len(sobrantes)} piezas avisadas que no han quedado colocadas")
+    return fallos, descartado
+
+
+def avisos_reempaquetado(modulo):
+    """reempaquetar: los avisos de al_colocar reflejan solo el resultado con que se queda"""
+    fallos = []
+    # (piezas, criterio, posiciones a retirar, se descarta el reempaquetado)
+    casos = [
+        (piezas_aleatorias(modulo, 27, 10, 60, 74), 'min_desperdicio', (12, 4), True),
+        (piezas_aleatorias(modulo, 30, 10, 45, 1), 'z_minima', (0, 3, 5), False),
+    ]
+    for piezas, criterio, quitar, descartar in casos:
+        fallos_caso, descartado = _avisos_reempaquetado(modulo, piezas, criterio, quitar)
+        nombre = 'descartado' if descartar else 'aceptado'
+        if descartado != descartar:
+            fallos_caso.append(f"se esperaba un reempaquetado {nombre}")
+        fallos += [f"{nombre}: {f}" for f in fallos_caso]
+    return fallos
+
+
+def vistas_piezaset(modulo):
+    """PiezaSet: la misma pieza es el mismo objeto y las vistas se pueden colocar y retirar"""
+    fallos = []
+    conjunto = modulo.PiezaSet.desde_piezas(piezas_aleatorias(modulo, 20, 10, 40, 5))
+    if conjunto[0] is not conjunto[0] or next(iter(conjunto)) is not conjunto[0]:
+        fallos.append("indexar o iterar dos veces la misma pieza da objetos distintos")
+
+    optimizador = modulo.Optimizador3D(modulo.Bloque(100, 80, 90))
+    optimizador.optimizar(conjunto)
+    colocada = optimizador.bloque.piezas_colocadas[0].origen
+    antes = len(optimizador.bloque.piezas_colocadas)
+    optimizador.retirar([conjunto[colocada._indice]])
+    if len(optimizador.bloque.piezas_colocadas) != antes - 1:
+        fallos.append("Optimizador3D.retirar([conjunto[i]]) no retira la pieza")
+
+    bloque = modulo.Bloque(100, 80, 90)
+    vista = conjunto[1]
+    try:
+        if not bloque.colocar_pieza(vista, (0, 0, 0)):
+            fallos.append("no se puede colocar una vista en un bloque vacío")
+    except AttributeError as e:
+        fallos.append(f"colocar una vista falla: {e}")
+    else:
+        if not conjunto.colocadas[1] or tuple(conjunto.posiciones[1]) != (0, 0, 0):
+            fallos.append("colocar una vista no actualiza las columnas del conjunto")
+        conjunto.actualizar(bloque)
+        if not conjunto.colocadas[1]:
+            fallos.append("actualizar() pierde las vistas colocadas directamente")
+        bloque.retirar_piezas([vista])
+        if conjunto.colocadas[1] or vista.posicion is not None:
+            fallos.append("retirar una vista no la marca como no colocada")
+    return fallos
+
+
+def reproduccion_exacto(modulo):
+    """OptimizadorExacto: cada pieza queda colocada o no colocada, aunque falle la reproducción"""
+
+    class BloqueQueRechaza(modulo.Bloque):
+        """Bloque que rechaza sus `rechazar` primeras colocaciones (sus copias, ninguna)"""
+        rechazar = 0
+
+        def colocar_pieza(self, pieza, posicion):
+            if self.rechazar:
+                self.rechazar -= 1
+                return False
+            return super().colocar_pieza(pieza, posicion)
+
+        def copiar(self):
+            copia = super().copiar()
+            copia.rechazar = 0
+            return copia
+
+    fallos = []
+    piezas = piezas_aleatorias(modulo, 8, 10, 40, 2)
+    for rechazar in (0, 1):
+        bloque = BloqueQueRechaza(60, 50, 60)
+        bloque.rechazar = rechazar
+        optimizador = modulo.OptimizadorExacto(bloque, tiempo_max=5.0)
+        reporte = optimizador.optimizar(piezas)
+        colocadas = [id(p.origen) for p in bloque.piezas_colocadas]
+        no_colocadas = [id(p) for p in optimizador.piezas_no_colocadas]
+        caso = f"rechazando {rechazar}"
+        if sorted(colocadas + no_colocadas) != sorted(id(p) for p in piezas):
+            fallos.append(f"{caso}: {len(colocadas)} colocadas y {len(no_colocadas)} no colocadas "
+                          f"no reparten las {len(piezas)} piezas")
+        if reporte['piezas_colocadas'] + reporte['piezas_no_colocadas'] != len(piezas):
+            fallos.append(f"{caso}: el reporte no suma las {len(piezas)} piezas")
+    return fallos
+
+
+def plazo_multiarranque(modulo):
+    """OptimizadorMultiArranque: la búsqueda para en tiempo_max y no deja procesos vivos"""
+    # Los procesos evaluadores necesitan importar el módulo por su nombre
+    sys.modules.setdefault(modulo.__name__, modulo)
+    fallos = []
+    piezas = piezas_aleatorias(modulo, 3000, 3, 15, 0)
+    optimizador = modulo.OptimizadorMultiArranque(modulo.Bloque(200, 118, 180), arranques=8,
+                                                  tiempo_max=1.0, workers=2)
+    reporte = optimizador.optimizar(piezas)
+    busqueda = reporte.get('tiempo_busqueda', reporte['tiempo'])
+    if busqueda > 1.5:
+        fallos.append(f"la búsqueda dura {busqueda:.2f}s con tiempo_max=1.0")
+    vivos = multiprocessing.active_children()
+    if vivos:
+        fallos.append(f"{len(vivos)} procesos siguen vivos al acabar")
+    if reporte['piezas_colocadas'] + reporte['piezas_no_colocadas'] != len(piezas):
+        fallos.append("la solución colocada no reparte todas las piezas")
+    return fallos
+
+
+def _greedy(modulo, piezas, criterio='z_minima'):
+    """Eficiencia del greedy normal de Optimizador3D con el bloque de las comprobaciones"""
+    return modulo.Optimizador3D(modulo.Bloque(100, 80, 90), criterio).optimizar(piezas)['eficiencia']
+
+
+def multiarranque_vs_greedy(modulo):
+    """OptimizadorMultiArranque: nunca peor que el greedy normal (su primer arranque)"""
+    fallos = []
+    for semilla in range(8):
+        piezas = piezas_aleatorias(modulo, 60, 10, 40, semilla)
+        greedy = _greedy(modulo, piezas)
+        optimizador = modulo.OptimizadorMultiArranque(modulo.Bloque(100, 80, 90), arranques=4,
+                                                      workers=1, semilla=semilla)
+        eficiencia = optimizador.optimizar(piezas)['eficiencia']
+        if eficiencia < greedy - 1e-9:
+            fallos.append(f"semilla {semilla}: {eficiencia:.2f}% frente a {greedy:.2f}% del greedy")
+    return fallos
+
+
+def genetico_vs_greedy(modulo):
+    """OptimizadorGenetico: nunca peor que el greedy normal, con todos los criterios"""
+    fallos = []
+    for criterio in modulo.CRITERIOS_HUECO:
+        for semilla in range(4):
+            piezas = piezas_aleatorias(modulo, 60, 10, 40, semilla)
+            greedy = _greedy(modulo, piezas, criterio)
+            # Solo el individuo greedy, y una población pequeña sin élite
+            for opciones in ({'poblacion': 1, 'generaciones': 0},
+                             {'poblacion': 6, 'generaciones': 3, 'elite': 0}):
+                optimizador = modulo.OptimizadorGenetico(modulo.Bloque(100, 80, 90), criterio,
+                                                         workers=1, semilla=semilla, **opciones)
+                eficiencia = optimizador.optimizar(piezas)['eficiencia']
+                if eficiencia < greedy - 1e-9:
+                    fallos.append(f"{criterio}, semilla {semilla}, {opciones}: {eficiencia:.2f}% "
+                                  f"frente a {greedy:.2f}% del greedy")
+    return fallos
+
+
+def cortes_altura_maxima(modulo):
+    """secuencia_cortes: con altura máxima menor que el bloque, el primer corte separa la franja superior"""
+    fallos = []
+    completo = (0, 0, 0, 200, 118, 180)
+    # (caso, bloque, pieza a colocar en el origen)
+    casos = [
+        ('pieza de toda la altura', modulo.Bloque(200, 118, 180, gestor_huecos='guillotina'),
+         modulo.Pieza('A', 200, 118, 150)),
+        ('con kerf', modulo.Bloque(200, 118, 180, gestor_huecos='guillotina',
+                                   restricciones=modulo.Restricciones(kerf=0.5)),
+         modulo.Pieza('A', 100, 60, 80)),
+        ('gestor dado', modulo.Bloque(200, 118, 180, gestor_huecos=modulo.GuillotinaCortes(200, 118, 180)),
+         modulo.Pieza('A', 100, 60, 80)),
+    ]
+    for caso, bloque, pieza in casos:
+        if not bloque.colocar_pieza(pieza, (0, 0, 0)):
+            fallos.append(f"{caso}: no se puede colocar la pieza")
+            continue
+        cortes = bloque.secuencia_cortes()
+        superiores = [c for c in cortes if c['eje'] == 'z' and c['posicion'] == 150]
+        if not cortes or cortes[0] != {'eje': 'z', 'posicion': 150, 'region': completo}:
+            fallos.append(f"{caso}: el primer corte no separa la franja superior: {cortes[:1]}")
+        elif len([c for c in superiores if c['region'] == completo]) != 1:
+            fallos.append(f"{caso}: la franja superior se corta más de una vez")
+        for corte in cortes[1:]:
+            if corte['region'][2] + corte['region'][5] > 150:
+                fallos.append(f"{caso}: un corte parte la franja superior: {corte}")
+    return fallos
+
+
+def vaciar_indice(modulo):
+    """Bloque.vaciar: el índice espacial queda vacío y conserva su configuración"""
+    fallos = []
+    indice = modulo.IndiceRejilla(100, 80, 90, tam_celda=7)
+    bloque = modulo.Bloque(100, 80, 90, indice=indice)
+    piezas = piezas_aleatorias(modulo, 20, 10, 40, 6)
+    modulo.Optimizador3D(bloque).optimizar(piezas)
+    bloque.vaciar()
+    if bloque.indice.tam_celda != 7:
+        fallos.append(f"tam_celda vuelve a {bloque.indice.tam_celda} en lugar de 7")
+    for nombre in modulo.INDICES_ESPACIALES:
+        bloque = modulo.Bloque(100, 80, 90, indice=nombre)
+        modulo.Optimizador3D(bloque).optimizar(piezas)
+        bloque.vaciar()
+        if list(bloque.indice.candidatas(0, 0, 0, 100, 80, 90)):
+            fallos.append(f"'{nombre}': el índice conserva piezas tras vaciar")
+        elif not bloque.colocar_pieza(modulo.Pieza('A', 100, 80, 90), (0, 0, 0)):
+            fallos.append(f"'{nombre}': no cabe una pieza del tamaño del bloque tras vaciar")
+    return fallos
+
+
+# Comprobaciones disponibles: función (módulo) -> lista de fallos
+COMPROBACIONES = {
+    'copia_guillotina': copia_guillotina,
+    'avisos_reempaquetado': avisos_reempaquetado,
+    'vistas_piezaset': vistas_piezaset,
+    'reproduccion_exacto': reproduccion_exacto,
+    'plazo_multiarranque': plazo_multiarranque,
+    'multiarranque_vs_greedy': multiarranque_vs_greedy,
+    'genetico_vs_greedy': genetico_vs_greedy,
+    'cortes_altura_maxima': cortes_altura_maxima,
+    'vaciar_indice': vaciar_indice,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('nombres', nargs='*', default=list(COMPROBACIONES),
+                        help=f"comprobaciones a ejecutar (opciones: {', '.join(COMPROBACIONES)})")
+    args = parser.parse_args()
+    desconocidas = set(args.nombres) - set(COMPROBACIONES)
+    if desconocidas:
+        parser.error(f"comprobaciones desconocidas: {', '.join(sorted(desconocidas))} "
+                     f"(opciones: {', '.join(COMPROBACIONES)})")
+
+    modulo = cargar_optimizador()
+    total = 0
+    for nombre in args.nombres:
+        fallos = COMPROBACIONES[nombre](modulo)
+        total += len(fallos)
+        print(f"{nombre:<24} {'OK' if not fallos else 'FALLO'}")
+        for fallo in fallos:
+            print(f"  {fallo}")
+    return 1 if total else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Utilidades compartidas por los benchmarks del optimizador 3D.
+
+El optimizador es un script con guion en el nombre, así que se carga por ruta.
+"""
+
+import importlib.util
+import os
+import random
+
+import numpy as np
+
+RUTA_OPTIMIZADOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'optimizador-3d.py')
+
+
+def cargar_optimizador(ruta=RUTA_OPTIMIZADOR, nombre='optimizador_3d'):
+    """Importa optimizador-3d.py (u otra versión del script, p. ej. de un commit anterior) como módulo"""
+    spec = importlib.util.spec_from_file_location(nombre, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def piezas_aleatorias(modulo, n, lado_min, lado_max, semilla):
+    """Genera n piezas con lados enteros uniformes en [lado_min, lado_max]"""
+    rng = random.Random(semilla)
+    return [modulo.Pieza(f"P{i}", rng.randint(lado_min, lado_max),
+                         rng.randint(lado_min, lado_max), rng.randint(lado_min, lado_max))
+            for i in range(n)]
+
+
+def _piezas_uniforme(rng, n, lado):
+    """Lados independientes uniformes entre la mitad y 1.5 veces el lado medio"""
+    return rng.uniform(0.5 * lado, 1.5 * lado, size=(n, 3))
+
+
+def _piezas_cola_pesada(rng, n, lado):
+    """Mayoría de piezas pequeñas y unas pocas muy grandes (Pareto, alfa 2.5)"""
+    escala = rng.pareto(2.5, size=(n, 1)) + 1
+    return np.clip(0.6 * lado * escala * rng.uniform(0.7, 1.3, size=(n, 3)), 1, 6 * lado)
+
+
+def _piezas_duplicados(rng, n, lado):
+    """Pocos modelos (10) repetidos muchas veces, como un pedido de serie"""
+    modelos = rng.uniform(0.5 * lado, 1.5 * lado, size=(10, 3))
+    return modelos[rng.integers(0, len(modelos), size=n)]
+
+
+def _piezas_laminas(rng, n, lado):
+    """Planchas finas: un lado de entre un 5 % y un 15 % de los otros dos"""
+    grande = lado * 1.8
+    dims = np.column_stack([rng.uniform(0.6 * grande, 1.4 * grande, size=n),
+                            rng.uniform(0.6 * grande, 1.4 * grande, size=n),
+                            rng.uniform(0.05 * grande, 0.15 * grande, size=n)])
+    # El lado fino no siempre está en el mismo eje
+    return rng.permuted(dims, axis=1)
+
+
+# Distribuciones de piezas: función (rng, n, lado_medio) -> array (n, 3)
+DISTRIBUCIONES = {
+    'uniforme': _piezas_uniforme,
+    'cola_pesada': _piezas_cola_pesada,
+    'duplicados': _piezas_duplicados,
+    'laminas': _piezas_laminas,
+}
+
+
+def generar_piezas(modulo, distribucion, n, dims_bloque, semilla, ocupacion=1.2):
+    """
+    Genera un PiezaSet reproducible de n piezas.
+    
+    El tamaño de las piezas se escala para que su volumen total sea unas
+    ocupacion veces el del bloque, de modo que con cualquier n el bloque se
+    llena y sobran piezas. Los lados se redondean a milímetros.
+    """
+    if distribucion not in DISTRIBUCIONES:
+        raise ValueError(f"Distribución desconocida: {distribucion} "
+                         f"(opciones: {', '.join(DISTRIBUCIONES)})")
+    rng = np.random.default_rng(semilla)
+    volumen_bloque = dims_bloque[0] * dims_bloque[1] * dims_bloque[2]
+    lado = (ocupacion * volumen_bloque / n) ** (1 / 3)
+    dims = DISTRIBUCIONES[distribucion](rng, n, lado)
+    # Reescalar al volumen objetivo (las distribuciones solo fijan la forma)
+    dims *= (ocupacion * volumen_bloque / dims.prod(axis=1).sum()) ** (1 / 3)
+    dims = np.clip(np.round(dims, 1), 0.1, None)
+    return modulo.PiezaSet([f"P{i}" for i in range(n)], dims)
@@ -8,27 +8,89 @@ Proyecto Python para simular y optimizar la colocación de piezas dentro de un b
 respetando restricciones de altura y aprovechando al máximo el volumen disponible.
 """
 
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
 import numpy as np
+import os
+import sys
+import argparse
+import copy
 import random
-from typing import List, Tuple, Dict
+import math
+import time
+import csv
+import itertools
+import functools
+import weakref
+from contextlib import contextmanager
+from typing import List, Tuple, Dict, Iterable, Iterator, Union, Optional
 import json
 
+# Las seis orientaciones de una caja como permutaciones de (ancho, alto, prof)
+_PERMUTACIONES = [(0, 1, 2), (0, 2, 1), (1, 0, 2), (1, 2, 0), (2, 0, 1), (2, 1, 0)]
+
+# Un giro de 90° alrededor de un eje intercambia las dimensiones de los otros dos
+_GIROS = {'x': (0, 2, 1), 'y': (2, 1, 0), 'z': (1, 0, 2)}
+
+@functools.lru_cache(maxsize=None)  # Solo hay 8 combinaciones de ejes
+def _permutaciones_permitidas(ejes_rotacion: str) -> Tuple[Tuple[int, int, int], ...]:
+    """Permutaciones alcanzables girando solo alrededor de los ejes indicados"""
+    alcanzables = {(0, 1, 2)}
+    pendientes = [(0, 1, 2)]
+    while pendientes:
+        actual = pendientes.pop()
+        for eje in ejes_rotacion:
+            giro = _GIROS[eje]
+            siguiente = tuple(actual[i] for i in giro)
+            if siguiente not in alcanzables:
+                alcanzables.add(siguiente)
+                pendientes.append(siguiente)
+    return tuple(p for p in _PERMUTACIONES if p in alcanzables)
+
 class Pieza:
     """Clase para representar una pieza 3D"""
     
-    def __init__(self, nombre: str, ancho: float, alto: float, profundidad: float):
+    # Sin __dict__: con cientos de miles de piezas en un lote la memoria cuenta
+    __slots__ = ('nombre', 'ancho', 'alto', 'profundidad', 'volumen', 'ejes_rotacion',
+                 'posicion', 'colocada', 'origen', '_color', '_orientaciones',
+                 '_matriz_orientaciones')
+    
+    def __init__(self, nombre: str, ancho: float, alto: float, profundidad: float,
+                 ejes_rotacion: str = 'xyz'):
+        """
+        Args:
+            nombre: Identificador de la pieza
+            ancho, alto, profundidad: Dimensiones en cm
+            ejes_rotacion: Ejes alrededor de los que se permite girar la pieza.
+                'xyz' permite las seis orientaciones, 'z' mantiene la profundidad
+                en vertical (p. ej. por la veta de la espuma) y '' la deja fija.
+        """
+        if set(ejes_rotacion) - set(_GIROS):
+            raise ValueError(f"Ejes de rotación no válidos: {ejes_rotacion!r} (usa 'x', 'y', 'z')")
         self.nombre = nombre
         self.ancho = ancho
         self.alto = alto
         self.profundidad = profundidad
         self.volumen = ancho * alto * profundidad
+        self.ejes_rotacion = ejes_rotacion
         self.posicion = None  # (x, y, z) cuando se coloque
         self.colocada = False
-        self.color = self._generar_color()
+        self.origen = None  # Pieza original si esta es una copia orientada
+        self._color = None  # Se genera al pedirlo (solo lo usa visualizar)
+        self._orientaciones = None  # Caché de orientaciones()
+        self._matriz_orientaciones = None
     
-    def _generar_color(self) -> Tuple[float, float, float, float]:
+    @property
+    def color(self) -> Tuple[float, float, float, float]:
+        """Color para la visualización; las copias orientadas usan el de su original"""
+        if self._color is None:
+            self._color = self.origen.color if self.origen is not None else self._generar_color()
+        return self._color
+    
+    @color.setter
+    def color(self, color: Tuple[float, float, float, float]):
+        self._color = color
+    
+    @staticmethod
+    def _generar_color() -> Tuple[float, float, float, float]:
         """Genera un color aleatorio para la visualización"""
         return (
             random.random(),
@@ -37,50 +99,958 @@ class Pieza:
             0.7
         )
     
+    def orientaciones(self) -> List[Tuple[float, float, float]]:
+        """
+        Orientaciones distintas (ancho, alto, prof) que admite la pieza.
+        
+        Empieza por la orientación original y omite las repetidas, así que un cubo
+        tiene una sola y una pieza con dos lados iguales tiene tres. El resultado
+        se calcula una vez y queda en caché.
+        """
+        if self._orientaciones is None:
+            dims = (self.ancho, self.alto, self.profundidad)
+            orientaciones = []
+            for perm in _permutaciones_permitidas(self.ejes_rotacion):
+                orientacion = tuple(dims[i] for i in perm)
+                if orientacion not in orientaciones:
+                    orientaciones.append(orientacion)
+            self._orientaciones = orientaciones
+        return self._orientaciones
+    
+    def matriz_orientaciones(self) -> np.ndarray:
+        """Orientaciones como array (k, 3) de float64, en caché"""
+        if self._matriz_orientaciones is None:
+            self._matriz_orientaciones = np.array(self.orientaciones(), dtype=np.float64)
+        return self._matriz_orientaciones
+    
+    def orientada(self, indice: int) -> 'Pieza':
+        """Crea la copia de la pieza con la orientación indicada para colocarla"""
+        ancho, alto, prof = self.orientaciones()[indice]
+        nombre = self.nombre if indice == 0 else f"{self.nombre}_rot"
+        pieza_orientada = Pieza(nombre, ancho, alto, prof, self.ejes_rotacion)
+        pieza_orientada.origen = self
+        return pieza_orientada
+    
     def rotar(self) -> 'Pieza':
-        """Crea una nueva pieza con dimensiones rotadas"""
-        rotaciones = [
-            (self.ancho, self.alto, self.profundidad),
-            (self.ancho, self.profundidad, self.alto),
-            (self.alto, self.ancho, self.profundidad),
-            (self.alto, self.profundidad, self.ancho),
-            (self.profundidad, self.ancho, self.alto),
-            (self.profundidad, self.alto, self.ancho)
-        ]
-        
-        ancho, alto, prof = random.choice(rotaciones)
-        pieza_rotada = Pieza(f"{self.nombre}_rot", ancho, alto, prof)
-        pieza_rotada.color = self.color
-        return pieza_rotada
+        """Crea una nueva pieza con una orientación permitida al azar"""
+        return self.orientada(random.randrange(len(self.orientaciones())))
+
+class PiezaSet:
+    """
+    Conjunto de piezas guardado por columnas en arrays de NumPy.
+    
+    Dimensiones, volúmenes, posiciones y el indicador de colocada ocupan un array
+    contiguo cada uno en lugar de un objeto por pieza. Al indexar o iterar se
+    obtienen vistas (VistaPieza) con la misma interfaz que Pieza, así que el
+    conjunto se puede pasar directamente a optimizar(). Mientras una vista
+    esté en uso, indexar la misma pieza devuelve el mismo objeto (p. ej. para
+    Optimizador3D.retirar), pero el conjunto no las mantiene vivas. Las
+    posiciones se vuelcan desde los bloques con actualizar().
+    """
+    
+    def __init__(self, nombres: List[str], dimensiones, ejes_rotacion: Union[str, List[str]] = 'xyz'):
+        """
+        Args:
+            nombres: Identificador de cada pieza
+            dimensiones: Array (n, 3) con (ancho, alto, prof) de cada pieza
+            ejes_rotacion: Ejes de giro permitidos, comunes o uno por pieza
+        """
+        self.nombres = list(nombres)
+        n = len(self.nombres)
+        self.dimensiones = np.array(dimensiones, dtype=np.float64).reshape(n, 3)
+        self.volumenes = self.dimensiones.prod(axis=1)
+        if isinstance(ejes_rotacion, str):
+            ejes_rotacion = [ejes_rotacion] * n
+        self.ejes_rotacion = np.array(ejes_rotacion, dtype='<U3')
+        for ejes in np.unique(self.ejes_rotacion):
+            if set(ejes) - set(_GIROS):
+                raise ValueError(f"Ejes de rotación no válidos: {ejes!r} (usa 'x', 'y', 'z')")
+        self.posiciones = np.full((n, 3), np.nan)
+        self.colocadas = np.zeros(n, dtype=bool)
+        self._colores = None  # (n, 4), solo si se piden colores
+        self._vistas = weakref.WeakValueDictionary()  # Índice -> vista en uso
+    
+    def __getstate__(self) -> Dict:
+        estado = self.__dict__.copy()
+        del estado['_vistas']  # Las vistas vivas no viajan (ni se pueden serializar)
+        return estado
+    
+    def __setstate__(self, estado: Dict):
+        self.__dict__.update(estado)
+        self._vistas = weakref.WeakValueDictionary()
+    
+    @classmethod
+    def desde_piezas(cls, piezas: Iterable[Pieza]) -> 'PiezaSet':
+        """Crea el conjunto a partir de objetos Pieza (o tuplas con sus datos)"""
+        datos = [_pieza_a_tupla(p) for p in piezas]
+        return cls([d[0] for d in datos], [d[1:4] for d in datos],
+                   [d[4] if len(d) > 4 else 'xyz' for d in datos])
+    
+    def __len__(self) -> int:
+        return len(self.nombres)
+    
+    def __getitem__(self, indice: int) -> 'VistaPieza':
+        if not -len(self) <= indice < len(self):
+            raise IndexError(indice)
+        return self._vista(indice % len(self))
+    
+    def __iter__(self) -> Iterator['VistaPieza']:
+        for i in range(len(self)):
+            yield self._vista(i)
+    
+    def _vista(self, indice: int) -> 'VistaPieza':
+        """Vista de la pieza indicada (la que ya esté en uso, si la hay)"""
+        vista = self._vistas.get(indice)
+        if vista is None:
+            vista = self._vistas[indice] = VistaPieza(self, indice)
+        return vista
+    
+    def color(self, indice: int) -> Tuple[float, float, float, float]:
+        """Color de la pieza indicada (la columna se crea al primer uso)"""
+        if self._colores is None:
+            self._colores = np.full((len(self), 4), np.nan)
+        if np.isnan(self._colores[indice, 0]):
+            self._colores[indice] = Pieza._generar_color()
+        return tuple(self._colores[indice].tolist())
+    
+    def actualizar(self, *bloques: 'Bloque'):
+        """Vuelca en las columnas las posiciones de las piezas del conjunto colocadas en los bloques"""
+        self.posiciones[:] = np.nan
+        self.colocadas[:] = False
+        for bloque in bloques:
+            for pieza in bloque.piezas_colocadas:
+                origen = pieza if isinstance(pieza, VistaPieza) else pieza.origen
+                if isinstance(origen, VistaPieza) and origen._conjunto is self:
+                    self.posiciones[origen._indice] = pieza.posicion
+                    self.colocadas[origen._indice] = True
+
+class VistaPieza(Pieza):
+    """
+    Pieza de un PiezaSet: lee sus datos de las columnas del conjunto. La
+    posición y el indicador de colocada también se escriben en las columnas,
+    así que la vista se puede colocar directamente con Bloque.colocar_pieza.
+    """
+    
+    __slots__ = ('_conjunto', '_indice', '__weakref__')
+    
+    def __init__(self, conjunto: PiezaSet, indice: int):
+        self._conjunto = conjunto
+        self._indice = indice
+        self._orientaciones = None
+        self._matriz_orientaciones = None
+    
+    nombre = property(lambda self: self._conjunto.nombres[self._indice])
+    ancho = property(lambda self: self._conjunto.dimensiones[self._indice, 0].item())
+    alto = property(lambda self: self._conjunto.dimensiones[self._indice, 1].item())
+    profundidad = property(lambda self: self._conjunto.dimensiones[self._indice, 2].item())
+    volumen = property(lambda self: self._conjunto.volumenes[self._indice].item())
+    ejes_rotacion = property(lambda self: str(self._conjunto.ejes_rotacion[self._indice]))
+    origen = property(lambda self: None)
+    
+    @property
+    def colocada(self) -> bool:
+        return bool(self._conjunto.colocadas[self._indice])
+    
+    @colocada.setter
+    def colocada(self, colocada: bool):
+        self._conjunto.colocadas[self._indice] = colocada
+    
+    @property
+    def posicion(self) -> Optional[Tuple[float, float, float]]:
+        if not self.colocada:
+            return None
+        return tuple(self._conjunto.posiciones[self._indice].tolist())
+    
+    @posicion.setter
+    def posicion(self, posicion: Optional[Tuple[float, float, float]]):
+        self._conjunto.posiciones[self._indice] = np.nan if posicion is None else posicion
+        self._conjunto.colocadas[self._indice] = posicion is not None
+    
+    @property
+    def color(self) -> Tuple[float, float, float, float]:
+        return self._conjunto.color(self._indice)
+
+# Caja alineada con los ejes: esquina (x, y, z) y dimensiones (ancho, alto, prof)
+CAJA_DTYPE = np.dtype([
+    ('x', np.float64), ('y', np.float64), ('z', np.float64),
+    ('ancho', np.float64), ('alto', np.float64), ('prof', np.float64),
+])
+
+_EJES = ('x', 'y', 'z')
+_LADOS = ('ancho', 'alto', 'prof')
+
+class IndiceLineal:
+    """Índice espacial trivial: compara contra todas las piezas colocadas"""
+    
+    def __init__(self, ancho: float, alto: float, profundidad: float):
+        self.piezas = []
+    
+    def vaciar(self):
+        """Olvida todas las piezas"""
+        self.piezas = []
+    
+    def insertar(self, pieza: Pieza):
+        """Registra una pieza ya colocada"""
+        self.piezas.append(pieza)
+    
+    def retirar(self, pieza: Pieza):
+        """Elimina una pieza registrada"""
+        self.piezas = [p for p in self.piezas if p is not pieza]
+    
+    def candidatas(self, x: float, y: float, z: float,
+                   ancho: float, alto: float, profundidad: float) -> Iterable[Pieza]:
+        """Devuelve las piezas que podrían solaparse con la caja indicada"""
+        return self.piezas
+
+class IndiceRejilla:
+    """
+    Índice espacial basado en una rejilla 3D uniforme.
+    
+    Cada pieza se registra en todas las celdas que toca, de modo que una consulta
+    solo revisa las piezas de las celdas que cubre la caja candidata en lugar de
+    todas las piezas del bloque.
+    """
+    
+    def __init__(self, ancho: float, alto: float, profundidad: float,
+                 tam_celda: float = None):
+        # Por defecto ~20 celdas en el eje más largo del bloque
+        self.tam_celda = tam_celda or max(ancho, alto, profundidad) / 20
+        self.celdas = {}  # (i, j, k) -> [piezas]
+    
+    def vaciar(self):
+        """Olvida todas las piezas (conserva el tamaño de celda)"""
+        self.celdas = {}
+    
+    def _rango(self, inicio: float, longitud: float) -> range:
+        """Índices de celda que cubre el intervalo [inicio, inicio + longitud]"""
+        return range(math.floor(inicio / self.tam_celda),
+                     math.floor((inicio + longitud) / self.tam_celda) + 1)
+    
+    def insertar(self, pieza: Pieza):
+        """Registra una pieza ya colocada en todas las celdas que ocupa"""
+        x, y, z = pieza.posicion
+        for i in self._rango(x, pieza.ancho):
+            for j in self._rango(y, pieza.alto):
+                for k in self._rango(z, pieza.profundidad):
+                    self.celdas.setdefault((i, j, k), []).append(pieza)
+    
+    def retirar(self, pieza: Pieza):
+        """Elimina una pieza de todas las celdas que ocupa"""
+        x, y, z = pieza.posicion
+        for i in self._rango(x, pieza.ancho):
+            for j in self._rango(y, pieza.alto):
+                for k in self._rango(z, pieza.profundidad):
+                    celda = [p for p in self.celdas.get((i, j, k), ()) if p is not pieza]
+                    if celda:
+                        self.celdas[(i, j, k)] = celda
+                    else:
+                        self.celdas.pop((i, j, k), None)
+    
+    def candidatas(self, x: float, y: float, z: float,
+                   ancho: float, alto: float, profundidad: float) -> Iterable[Pieza]:
+        """Devuelve (sin repetir) las piezas de las celdas que cubre la caja"""
+        vistas = {}
+        for i in self._rango(x, ancho):
+            for j in self._rango(y, alto):
+                for k in self._rango(z, profundidad):
+                    for pieza in self.celdas.get((i, j, k), ()):
+                        vistas[id(pieza)] = pieza
+        return vistas.values()
+
+class IndiceVectorial:
+    """
+    Índice espacial con las cajas colocadas en un array estructurado de NumPy.
+    
+    Cada consulta compara la caja candidata con todas las colocadas en una sola
+    operación vectorizada y devuelve exactamente las piezas que se solapan.
+    """
+    
+    def __init__(self, ancho: float, alto: float, profundidad: float):
+        self.piezas = []
+        self.cajas = np.zeros(64, dtype=CAJA_DTYPE)  # Capacidad inicial, crece x2
+    
+    def vaciar(self):
+        """Olvida todas las piezas"""
+        self.piezas = []
+        self.cajas = np.zeros(64, dtype=CAJA_DTYPE)
+    
+    def insertar(self, pieza: Pieza):
+        """Registra una pieza ya colocada"""
+        n = len(self.piezas)
+        if n == len(self.cajas):
+            self.cajas = np.concatenate([self.cajas, np.zeros(n, dtype=CAJA_DTYPE)])
+        self.cajas[n] = (*pieza.posicion, pieza.ancho, pieza.alto, pieza.profundidad)
+        self.piezas.append(pieza)
+    
+    def retirar(self, pieza: Pieza):
+        """Elimina una pieza registrada desplazando las cajas siguientes"""
+        n = len(self.piezas)
+        i = next(i for i, p in enumerate(self.piezas) if p is pieza)
+        self.cajas[i:n - 1] = self.cajas[i + 1:n]
+        del self.piezas[i]
+    
+    def candidatas(self, x: float, y: float, z: float,
+                   ancho: float, alto: float, profundidad: float) -> Iterable[Pieza]:
+        """Devuelve las piezas que se solapan con la caja indicada"""
+        c = self.cajas[:len(self.piezas)]
+        solapa = ((c['x'] < x + ancho) & (x < c['x'] + c['ancho']) &
+                  (c['y'] < y + alto) & (y < c['y'] + c['alto']) &
+                  (c['z'] < z + profundidad) & (z < c['z'] + c['prof']))
+        return [self.piezas[i] for i in np.flatnonzero(solapa)]
+
+# Índices espaciales disponibles para Bloque(indice=...)
+INDICES_ESPACIALES = {
+    'lineal': IndiceLineal,
+    'rejilla': IndiceRejilla,
+    'vectorial': IndiceVectorial,
+}
+
+class HuecosDivision:
+    """Gestión original de huecos: divide cada hueco afectado hasta en seis trozos"""
+    
+    def __init__(self, ancho: float, alto: float, profundidad: float):
+        self.dimensiones = (ancho, alto, profundidad)
+        self.huecos = [(0, 0, 0, ancho, alto, profundidad)]  # (x, y, z, ancho, alto, prof)
+        self.lado_minimo = 0  # Descarta huecos donde no cabe ninguna pieza
+    
+    def ocupar(self, x: float, y: float, z: float,
+               ancho: float, alto: float, profundidad: float):
+        """Actualiza los huecos tras ocupar la caja indicada"""
+        # Dividir huecos existentes
+        nuevos_huecos = []
+        for hueco in self.huecos:
+            hx, hy, hz, hancho, halto, hprof = hueco
+            
+            # Si el hueco se superpone con la pieza, dividirlo
+            if not (x + ancho <= hx or hx + hancho <= x or
+                   y + alto <= hy or hy + halto <= y or
+                   z + profundidad <= hz or hz + hprof <= z):
+                
+                # Crear nuevos huecos alrededor de la pieza colocada
+                if hx < x:
+                    nuevos_huecos.append((hx, hy, hz, x - hx, halto, hprof))
+                if hx + hancho > x + ancho:
+                    nuevos_huecos.append((x + ancho, hy, hz, 
+                                        hx + hancho - (x + ancho), halto, hprof))
+                if hy < y:
+                    nuevos_huecos.append((max(hx, x), hy, hz, 
+                                        min(hancho, x + ancho - max(hx, x)), 
+                                        y - hy, hprof))
+                if hy + halto > y + alto:
+                    nuevos_huecos.append((max(hx, x), y + alto, hz, 
+                                        min(hancho, x + ancho - max(hx, x)), 
+                                        hy + halto - (y + alto), hprof))
+                if hz < z:
+                    nuevos_huecos.append((max(hx, x), max(hy, y), hz, 
+                                        min(hancho, x + ancho - max(hx, x)), 
+                                        min(halto, y + alto - max(hy, y)), 
+                                        z - hz))
+                if hz + hprof > z + profundidad:
+                    nuevos_huecos.append((max(hx, x), max(hy, y), z + profundidad, 
+                                        min(hancho, x + ancho - max(hx, x)), 
+                                        min(halto, y + alto - max(hy, y)), 
+                                        hz + hprof - (z + profundidad)))
+            else:
+                nuevos_huecos.append(hueco)
+        
+        lado_minimo = self.lado_minimo
+        self.huecos = [h for h in nuevos_huecos
+                       if h[3] > 0 and h[4] > 0 and h[5] > 0 and min(h[3], h[4], h[5]) >= lado_minimo]
+    
+    def admite(self, x: float, y: float, z: float,
+               ancho: float, alto: float, profundidad: float) -> bool:
+        """Cualquier caja libre se puede ocupar (no hay restricciones de corte)"""
+        return True
+    
+    def liberar(self, caja: Tuple, ocupadas: np.ndarray):
+        """
+        Actualiza los huecos tras vaciar la caja indicada. Las divisiones no se
+        pueden deshacer, así que se repiten desde el bloque vacío con las cajas
+        que siguen ocupadas.
+        """
+        self.huecos = [(0, 0, 0, *self.dimensiones)]
+        for ocupada in ocupadas.tolist():
+            self.ocupar(*ocupada)
+    
+    @property
+    def cajas(self) -> np.ndarray:
+        """Huecos como array estructurado de CAJA_DTYPE"""
+        return np.array(self.huecos, dtype=CAJA_DTYPE)
+
+class EspaciosMaximales:
+    """
+    Gestión de huecos por espacios vacíos maximales (MES).
+    
+    Cada hueco es una caja vacía que no puede crecer en ningún eje sin tocar una
+    pieza. Los huecos pueden solaparse entre sí, pero nunca hay uno contenido en
+    otro: al ocupar una caja, cada hueco afectado se recorta en hasta seis
+    subespacios a tamaño completo y se descartan los dominados. Dos huecos
+    contiguos y alineados nunca conviven, porque la caja que los une también está
+    vacía y los domina a ambos. Los huecos se guardan como filas (x, y, z,
+    ancho, alto, prof) de un array float64 contiguo, que se compara con
+    operaciones sobre los tres ejes a la vez; cajas lo ofrece como array
+    estructurado (CAJA_DTYPE) sin copiarlo.
+    
+    Con medidas no enteras (p. ej. kerf 0.2) las sumas acumulan error de
+    redondeo, así que la poda compara con una tolerancia relativa al bloque:
+    sin ella sobreviven huecos casi iguales o dominados por muy poco.
+    """
+    
+    def __init__(self, ancho: float, alto: float, profundidad: float):
+        self.dimensiones = (ancho, alto, profundidad)
+        self._datos = np.array([[0, 0, 0, ancho, alto, profundidad]], dtype=np.float64)
+        # Los huecos con algún lado menor que este valor se descartan
+        # (el optimizador lo ajusta al lado más corto de las piezas pendientes)
+        self.lado_minimo = 0
+        # Diferencias por debajo de este valor son error de redondeo
+        self.tolerancia = 1e-9 * max(ancho, alto, profundidad)
+        self._huecos = None  # Caché de la vista como lista de tuplas
+    
+    @property
+    def cajas(self) -> np.ndarray:
+        """Huecos como array estructurado de CAJA_DTYPE (vista, sin copia)"""
+        return self._datos.view(CAJA_DTYPE)[:, 0]
+    
+    @cajas.setter
+    def cajas(self, cajas: np.ndarray):
+        self._datos = np.ascontiguousarray(cajas, dtype=CAJA_DTYPE).view(np.float64).reshape(-1, 6)
+        self._huecos = None
+    
+    @property
+    def huecos(self) -> List[Tuple[float, float, float, float, float, float]]:
+        """Huecos como lista de tuplas (x, y, z, ancho, alto, prof)"""
+        if self._huecos is None:
+            self._huecos = self.cajas.tolist()
+        return self._huecos
+    
+    # Filas de las caras de la caja en _recortar: cara 2 * eje (lado de
+    # menor coordenada) y 2 * eje + 1 (lado de mayor coordenada)
+    _CARAS_MENORES = np.array([0, 2, 4])
+    _CARAS_MAYORES = np.array([1, 3, 5])
+    
+    @classmethod
+    def _recortar(cls, afectados: np.ndarray, inicio: np.ndarray, fin: np.ndarray,
+                  tolerancia: float = 0.0) -> np.ndarray:
+        """
+        Subespacios maximales que quedan libres en cada hueco afectado (filas
+        x, y, z, ancho, alto, prof) alrededor de la caja [inicio, fin), cara a
+        cara y sin las láminas más finas que la tolerancia
+        """
+        ejes = np.arange(3)
+        origen, lados = afectados[:, :3].T, afectados[:, 3:].T
+        trozos = np.broadcast_to(afectados, (6, *afectados.shape)).copy()
+        # Lado de menor coordenada: el hueco se corta en la cara inicial de la caja
+        trozos[cls._CARAS_MENORES, :, 3 + ejes] = inicio[:, None] - origen
+        # Lado de mayor coordenada: empieza en la cara final de la caja
+        trozos[cls._CARAS_MAYORES, :, 3 + ejes] = origen + lados - fin[:, None]
+        trozos[cls._CARAS_MAYORES, :, ejes] = fin[:, None]
+        
+        existe = np.empty((6, len(afectados)), dtype=bool)
+        existe[cls._CARAS_MENORES] = origen < inicio[:, None] - tolerancia
+        existe[cls._CARAS_MAYORES] = origen + lados > fin[:, None] + tolerancia
+        return trozos[existe]
+    
+    @staticmethod
+    def _contenidos(trozos: np.ndarray, huecos: np.ndarray, tolerancia: float = 0.0) -> np.ndarray:
+        """Matriz booleana (t, h): el hueco j contiene al trozo i (salvo la tolerancia)"""
+        t_ini = trozos[:, :3] + tolerancia
+        t_fin = trozos[:, :3] + trozos[:, 3:]
+        h_ini = huecos[:, :3]
+        h_fin = huecos[:, :3] + huecos[:, 3:] + tolerancia
+        resultado = np.ones((len(trozos), len(huecos)), dtype=bool)
+        for i in range(3):
+            resultado &= h_ini[None, :, i] <= t_ini[:, None, i]
+            resultado &= t_fin[:, None, i] <= h_fin[None, :, i]
+        return resultado
+    
+    def ocupar(self, x: float, y: float, z: float,
+               ancho: float, alto: float, profundidad: float):
+        """Actualiza los huecos tras ocupar la caja indicada"""
+        inicio = np.array((x, y, z))
+        fin = inicio + (ancho, alto, profundidad)
+        d = self._datos
+        
+        # Huecos que tocan o solapan la caja
+        origen = d[:, :3]
+        final = origen + d[:, 3:]
+        cerca = (origen <= fin + self.tolerancia) & (final >= inicio - self.tolerancia)
+        cercanos = np.flatnonzero(cerca[:, 0] & cerca[:, 1] & cerca[:, 2])
+        solapa = (origen[cercanos] < fin) & (final[cercanos] > inicio)
+        solapa = solapa[:, 0] & solapa[:, 1] & solapa[:, 2]
+        if not solapa.any():
+            return
+        
+        afectados = np.zeros(len(d), dtype=bool)
+        afectados[cercanos[solapa]] = True
+        vecinos = d[cercanos[~solapa]]  # Intactos que tocan la caja por alguna cara
+        
+        trozos = self._recortar(d[cercanos[solapa]], inicio, fin, self.tolerancia)
+        trozos = trozos[trozos[:, 3:].min(axis=1) >= self.lado_minimo]
+        
+        # Los huecos intactos ya eran maximales, así que solo hay que podar los
+        # trozos nuevos. Un trozo solo puede estar contenido en otro trozo o en
+        # un hueco vecino (con redondeo, también en trozos de otra cara).
+        n = len(trozos)
+        contenidos = self._contenidos(trozos, np.concatenate([trozos, vecinos]), self.tolerancia)
+        entre_si = contenidos[:, :n]
+        # De dos trozos idénticos (o casi) se conserva el primero
+        entre_si &= ~entre_si.T | np.tri(n, k=-1, dtype=bool)
+        dominado = contenidos.any(axis=1)
+        
+        self._datos = np.concatenate([d[~afectados], trozos[~dominado]])
+        self._huecos = None
+    
+    def admite(self, x: float, y: float, z: float,
+               ancho: float, alto: float, profundidad: float) -> bool:
+        """Cualquier caja libre se puede ocupar (no hay restricciones de corte)"""
+        return True
+    
+    @staticmethod
+    def _solapan(cajas: np.ndarray, caja: Tuple) -> np.ndarray:
+        """Máscara de las cajas que se solapan (con volumen) con la caja indicada"""
+        resultado = np.ones(len(cajas), dtype=bool)
+        for i, (eje, lado) in enumerate(zip(_EJES, _LADOS)):
+            resultado &= (cajas[eje] < caja[i] + caja[3 + i]) & (cajas[eje] + cajas[lado] > caja[i])
+        return resultado
+    
+    def liberar(self, caja: Tuple, ocupadas: np.ndarray):
+        """
+        Actualiza los huecos tras vaciar la caja indicada.
+        
+        Los huecos que no pueden crecer hacia la caja siguen siendo maximales;
+        solo faltan los espacios maximales que la atraviesan. Se obtienen
+        recortando el bloque con las cajas ocupadas, como en ocupar, pero
+        quedándose en cada paso solo con los espacios que solapan la caja
+        liberada, así que el conjunto de trabajo es pequeño. Los huecos
+        antiguos contenidos en alguno de estos espacios dejan de ser maximales.
+        """
+        region = EspaciosMaximales(*self.dimensiones)
+        region.lado_minimo = self.lado_minimo
+        
+        # Las cajas más cercanas recortan más, así que van primero
+        centro = [caja[i] + caja[3 + i] / 2 for i in range(3)]
+        distancia = sum(np.abs(ocupadas[eje] + ocupadas[lado] / 2 - centro[i])
+                        for i, (eje, lado) in enumerate(zip(_EJES, _LADOS)))
+        pendientes = ocupadas[np.argsort(distancia, kind='stable')]
+        while len(pendientes) and len(region.cajas):
+            # Los espacios solo encogen: una caja que queda fuera de su
+            # envolvente ya no puede recortar nada
+            c = region.cajas
+            envolvente = tuple(c[eje].min() for eje in _EJES)
+            envolvente += tuple((c[eje] + c[lado]).max() - envolvente[i]
+                                for i, (eje, lado) in enumerate(zip(_EJES, _LADOS)))
+            pendientes = pendientes[self._solapan(pendientes, envolvente)]
+            for ocupada in pendientes[:8].tolist():
+                region.ocupar(*ocupada)
+                region.cajas = region.cajas[self._solapan(region.cajas, caja)]
+            pendientes = pendientes[8:]
+        
+        nuevos = region._datos
+        contenidos = self._contenidos(self._datos, nuevos, self.tolerancia).any(axis=1)
+        self._datos = np.concatenate([self._datos[~contenidos], nuevos])
+        self._huecos = None
+
+class _NodoCorte:
+    """Nodo del árbol de cortes: región [lo, hi) y, si está cortada, eje, posición e hijos"""
+    
+    __slots__ = ('lo', 'hi', 'padre', 'eje', 'corte', 'hijos', 'libre', 'fila')
+    
+    def __init__(self, lo: Tuple[float, float, float], hi: Tuple[float, float, float],
+                 padre: Optional['_NodoCorte'] = None):
+        self.lo = lo
+        self.hi = hi
+        self.padre = padre
+        self.eje = None  # 0, 1 o 2 si el nodo está cortado
+        self.corte = None
+        self.hijos = None  # (lado menor, lado mayor) del corte
+        self.libre = True  # Hoja sin pieza (las hojas ocupadas y los nodos cortados no lo son)
+        self.fila = None  # Fila en GuillotinaCortes._cajas si la hoja se ofrece como hueco
+
+class GuillotinaCortes:
+    """
+    Gestión de huecos por cortes de guillotina.
+    
+    Las sierras de espuma solo cortan de lado a lado, así que el bloque se
+    describe como un árbol binario de cortes: cada nodo es una región que o
+    bien es una hoja (libre u ocupada por una pieza) o bien se corta en dos
+    con un plano perpendicular a un eje. Colocar una pieza en la esquina de
+    una hoja libre la separa con hasta seis cortes, en el orden de ejes que
+    deja el trozo sobrante más grande. Cualquier colocación obtenida así se
+    puede cortar por construcción, y cortes() da la secuencia de la sierra.
+    
+    Los huecos son las hojas libres. Se guardan en un array estructurado
+    (CAJA_DTYPE) con borrado por intercambio con el último y en un diccionario
+    por esquina, así que colocar o retirar una pieza no depende del tamaño
+    del árbol (salvo al fusionar hojas hermanas libres al retirar). Cada hoja
+    guarda su fila, de modo que copy.deepcopy (Bloque.copiar) da un gestor
+    coherente sin pasos extra.
+    """
+    
+    def __init__(self, ancho: float, alto: float, profundidad: float):
+        self.dimensiones = (ancho, alto, profundidad)
+        self.raiz = _NodoCorte((0, 0, 0), (ancho, alto, profundidad))
+        # Las hojas con algún lado menor que este valor no se ofrecen como hueco
+        self.lado_minimo = 0
+        self._cajas = np.zeros(64, dtype=CAJA_DTYPE)  # Capacidad inicial, crece x2
+        self._nodos = []  # Hoja de cada fila de _cajas
+        self._por_esquina = {}  # Esquina inferior -> hoja libre (no se repiten)
+        self._huecos = None  # Caché de la vista como lista de tuplas
+        self._registrar(self.raiz)
+    
+    @property
+    def cajas(self) -> np.ndarray:
+        """Hojas libres como array estructurado de CAJA_DTYPE (vista, sin copia)"""
+        return self._cajas[:len(self._nodos)]
+    
+    @property
+    def huecos(self) -> List[Tuple[float, float, float, float, float, float]]:
+        """Huecos como lista de tuplas (x, y, z, ancho, alto, prof)"""
+        if self._huecos is None:
+            self._huecos = self.cajas.tolist()
+        return self._huecos
+    
+    def _registrar(self, hoja: _NodoCorte):
+        """Da de alta una hoja libre (como hueco solo si es lo bastante grande)"""
+        self._por_esquina[hoja.lo] = hoja
+        lados = [hoja.hi[i] - hoja.lo[i] for i in range(3)]
+        if min(lados) < self.lado_minimo:
+            return
+        n = len(self._nodos)
+        if n == len(self._cajas):
+            self._cajas = np.concatenate([self._cajas, np.zeros(n, dtype=CAJA_DTYPE)])
+        self._cajas[n] = (*hoja.lo, *lados)
+        self._nodos.append(hoja)
+        hoja.fila = n
+    
+    def _desregistrar(self, hoja: _NodoCorte):
+        """Da de baja una hoja libre moviendo la última fila a su sitio"""
+        if self._por_esquina.get(hoja.lo) is hoja:
+            del self._por_esquina[hoja.lo]
+        fila, hoja.fila = hoja.fila, None
+        if fila is None:
+            return
+        ultima = len(self._nodos) - 1
+        if fila != ultima:
+            self._cajas[fila] = self._cajas[ultima]
+            self._nodos[fila] = self._nodos[ultima]
+            self._nodos[fila].fila = fila
+        self._nodos.pop()
+    
+    def _hoja_en(self, punto: Tuple[float, float, float]) -> _NodoCorte:
+        """Hoja que contiene el punto (un punto sobre un corte pertenece al lado mayor)"""
+        nodo = self.raiz
+        while nodo.hijos is not None:
+            nodo = nodo.hijos[0] if punto[nodo.eje] < nodo.corte else nodo.hijos[1]
+        return nodo
+    
+    @staticmethod
+    def _orden_cortes(hoja: _NodoCorte, lo: Tuple, hi: Tuple) -> Tuple[int, int, int]:
+        """Orden de ejes que deja el trozo sobrante más grande al separar [lo, hi) de la hoja"""
+        mejor, mejor_volumen = None, -1.0
+        for orden in _PERMUTACIONES:
+            region_lo, region_hi = list(hoja.lo), list(hoja.hi)
+            mayor = 0.0
+            for eje in orden:
+                resto = 1.0
+                for otro in range(3):
+                    if otro != eje:
+                        resto *= region_hi[otro] - region_lo[otro]
+                mayor = max(mayor, (lo[eje] - region_lo[eje]) * resto,
+                            (region_hi[eje] - hi[eje]) * resto)
+                region_lo[eje], region_hi[eje] = lo[eje], hi[eje]
+            if mayor > mejor_volumen:
+                mejor, mejor_volumen = orden, mayor
+        return mejor
+    
+    def _cortar(self, nodo: _NodoCorte, eje: int, posicion: float) -> Tuple[_NodoCorte, _NodoCorte]:
+        """Corta un nodo en dos con un plano perpendicular al eje"""
+        hi_menor = list(nodo.hi)
+        hi_menor[eje] = posicion
+        lo_mayor = list(nodo.lo)
+        lo_mayor[eje] = posicion
+        nodo.eje, nodo.corte, nodo.libre = eje, posicion, False
+        nodo.hijos = (_NodoCorte(nodo.lo, tuple(hi_menor), nodo),
+                      _NodoCorte(tuple(lo_mayor), nodo.hi, nodo))
+        return nodo.hijos
+    
+    def _separar(self, hoja: _NodoCorte, lo: Tuple, hi: Tuple):
+        """Separa la caja [lo, hi) de una hoja libre que la contiene y la marca ocupada"""
+        self._desregistrar(hoja)
+        nodo = hoja
+        for eje in self._orden_cortes(hoja, lo, hi):
+            if lo[eje] > nodo.lo[eje]:
+                sobrante, nodo = self._cortar(nodo, eje, lo[eje])
+                self._registrar(sobrante)
+            if hi[eje] < nodo.hi[eje]:
+                nodo, sobrante = self._cortar(nodo, eje, hi[eje])
+                self._registrar(sobrante)
+        nodo.libre = False
+    
+    def admite(self, x: float, y: float, z: float,
+               ancho: float, alto: float, profundidad: float) -> bool:
+        """La caja cabe entera en una hoja libre (si no, no se podría cortar)"""
+        hoja = self._por_esquina.get((x, y, z)) or self._hoja_en((x, y, z))
+        return (hoja.libre and x + ancho <= hoja.hi[0] and y + alto <= hoja.hi[1]
+                and z + profundidad <= hoja.hi[2])
+    
+    def ocupar(self, x: float, y: float, z: float,
+               ancho: float, alto: float, profundidad: float):
+        """Actualiza los huecos tras ocupar la caja indicada"""
+        lo, hi = (x, y, z), (x + ancho, y + alto, z + profundidad)
+        hoja = self._por_esquina.get(lo)
+        if hoja is not None and all(hi[i] <= hoja.hi[i] for i in range(3)):
+            # Caso habitual: la pieza va en la esquina de un hueco
+            self._separar(hoja, lo, hi)
+        else:
+            # Caja arbitraria (zonas prohibidas): se ocupa su parte en cada
+            # hoja libre que toca
+            pendientes, afectadas = [self.raiz], []
+            while pendientes:
+                nodo = pendientes.pop()
+                if nodo.hijos is None:
+                    if nodo.libre:
+                        afectadas.append(nodo)
+                    continue
+                if lo[nodo.eje] < nodo.corte:
+                    pendientes.append(nodo.hijos[0])
+                if hi[nodo.eje] > nodo.corte:
+                    pendientes.append(nodo.hijos[1])
+            for hoja in afectadas:
+                inter_lo = tuple(max(lo[i], hoja.lo[i]) for i in range(3))
+                inter_hi = tuple(min(hi[i], hoja.hi[i]) for i in range(3))
+                if all(inter_lo[i] < inter_hi[i] for i in range(3)):
+                    self._separar(hoja, inter_lo, inter_hi)
+        self._huecos = None
+    
+    def liberar(self, caja: Tuple, ocupadas: np.ndarray):
+        """
+        Actualiza los huecos tras vaciar la caja indicada: su hoja vuelve a estar
+        libre y se deshacen los cortes cuyos dos lados han quedado libres
+        """
+        nodo = self._hoja_en(caja[:3])
+        nodo.libre = True
+        while nodo.padre is not None:
+            padre = nodo.padre
+            menor, mayor = padre.hijos
+            if not (menor.libre and mayor.libre and menor.hijos is None and mayor.hijos is None):
+                break
+            self._desregistrar(menor)
+            self._desregistrar(mayor)
+            padre.eje = padre.corte = padre.hijos = None
+            padre.libre = True
+            nodo = padre
+        self._registrar(nodo)
+        self._huecos = None
+    
+    def cortes(self) -> Iterator[Dict]:
+        """
+        Secuencia de cortes de la sierra, cada corte antes que los de sus trozos.
+        
+        Cada corte es un dict con el eje ('x', 'y' o 'z'), la posición del plano
+        y la región (x, y, z, ancho, alto, prof) que parte.
+        """
+        pendientes = [self.raiz]
+        while pendientes:
+            nodo = pendientes.pop()
+            if nodo.hijos is None:
+                continue
+            yield {
+                'eje': _EJES[nodo.eje],
+                'posicion': nodo.corte,
+                'region': (*nodo.lo, *(nodo.hi[i] - nodo.lo[i] for i in range(3))),
+            }
+            pendientes.append(nodo.hijos[1])
+            pendientes.append(nodo.hijos[0])
+    
+    def hojas_libres(self) -> Iterator[_NodoCorte]:
+        """Hojas libres del árbol recorriéndolo entero (sin usar las estructuras de huecos)"""
+        pendientes = [self.raiz]
+        while pendientes:
+            nodo = pendientes.pop()
+            if nodo.hijos is not None:
+                pendientes.extend(nodo.hijos)
+            elif nodo.libre:
+                yield nodo
+
+# Gestores de espacio libre disponibles para Bloque(gestor_huecos=...)
+GESTORES_HUECOS = {
+    'maximales': EspaciosMaximales,
+    'division': HuecosDivision,
+    'guillotina': GuillotinaCortes,
+}
+
+def _nombre_gestor(gestor) -> Optional[str]:
+    """Nombre en GESTORES_HUECOS del tipo de gestor (None si es uno propio)"""
+    return next((nombre for nombre, clase in GESTORES_HUECOS.items() if type(gestor) is clase), None)
+
+class Restricciones:
+    """
+    Restricciones de corte de un bloque (dependen de la máquina y del pedido).
+    
+    Bloque las compila al crearse en lugar de comprobarlas pieza a pieza:
+    - altura_maxima y kerf recortan y amplían el espacio inicial de huecos, así
+      que un hueco nunca ofrece sitio por encima del límite ni sin separación;
+    - las zonas prohibidas se ocupan de antemano en el gestor de huecos y se
+      guardan en un array para la comprobación vectorizada de puede_colocar;
+    - los bloqueos de orientación reducen las orientaciones candidatas antes
+      de buscar hueco.
+    
+    El kerf se aplica ampliando cada pieza (y el bloque) kerf cm hacia +x, +y
+    y +z: dos piezas ampliadas que no se solapan quedan separadas al menos por
+    el ancho de la hoja.
+    """
+    
+    def __init__(self, altura_maxima: Optional[float] = 150, kerf: float = 0,
+                 zonas_prohibidas: Iterable[Tuple[float, float, float, float, float, float]] = (),
+                 orientaciones: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            altura_maxima: Altura máxima de corte en cm (None = sin límite)
+            kerf: Ancho de la hoja en cm: separación mínima entre piezas
+            zonas_prohibidas: Cajas (x, y, z, ancho, alto, prof) donde no se
+                puede colocar nada (defectos de la espuma, sujeciones...)
+            orientaciones: Ejes de giro permitidos por nombre de pieza; se
+                combinan con los ejes_rotacion de la propia pieza
+        """
+        if kerf < 0:
+            raise ValueError(f"El kerf no puede ser negativo: {kerf}")
+        self.altura_maxima = altura_maxima
+        self.kerf = kerf
+        self.zonas_prohibidas = [tuple(zona) for zona in zonas_prohibidas]
+        for zona in self.zonas_prohibidas:
+            if len(zona) != 6 or min(zona[3:]) <= 0:
+                raise ValueError(f"Zona prohibida no válida: {zona} (x, y, z, ancho, alto, prof)")
+        self.orientaciones = dict(orientaciones or {})
+        for nombre, ejes in self.orientaciones.items():
+            if set(ejes) - set(_GIROS):
+                raise ValueError(f"Ejes de rotación no válidos para {nombre}: {ejes!r} "
+                                 f"(usa 'x', 'y', 'z')")
+    
+    def indices_orientacion(self, pieza: Pieza) -> Optional[List[int]]:
+        """
+        Índices de pieza.orientaciones() que permite el bloqueo de la pieza, o
+        None si no tiene bloqueo
+        """
+        ejes = self.orientaciones.get(pieza.nombre)
+        if ejes is None:
+            return None
+        dims = (pieza.ancho, pieza.alto, pieza.profundidad)
+        permitidas = {tuple(dims[i] for i in perm) for perm in _permutaciones_permitidas(ejes)}
+        return [i for i, orientacion in enumerate(pieza.orientaciones()) if orientacion in permitidas]
 
 class Bloque:
     """Clase para representar el bloque de espuma"""
     
-    def __init__(self, ancho: float, alto: float, profundidad: float):
+    def __init__(self, ancho: float, alto: float, profundidad: float,
+                 indice: Union[str, object] = 'vectorial',
+                 gestor_huecos: Union[str, object] = 'maximales',
+                 restricciones: Optional[Restricciones] = None):
         self.ancho = ancho
         self.alto = alto
         self.profundidad = profundidad
         self.volumen_total = ancho * alto * profundidad
         self.volumen_ocupado = 0
         self.piezas_colocadas = []
-        self.huecos = [(0, 0, 0, ancho, alto, profundidad)]  # (x, y, z, ancho, alto, prof)
+        self.al_colocar = []  # Funciones llamadas con cada pieza que se coloca
+        
+        # Restricciones compiladas: límites del espacio (ampliado con el kerf)
+        # y cajas que están ocupadas desde el principio
+        self.restricciones = restricciones or Restricciones()
+        kerf = self.restricciones.kerf
+        altura = profundidad
+        if self.restricciones.altura_maxima is not None:
+            altura = min(profundidad, self.restricciones.altura_maxima)
+        self.limites = (ancho + kerf, alto + kerf, altura + kerf)
+        self.zonas = np.array([(x, y, z, a + kerf, h + kerf, p + kerf)
+                               for x, y, z, a, h, p in self.restricciones.zonas_prohibidas],
+                              dtype=CAJA_DTYPE)
+        
+        # Gestor del espacio libre (expone la lista de huecos)
+        if isinstance(gestor_huecos, str):
+            if gestor_huecos not in GESTORES_HUECOS:
+                raise ValueError(f"Gestor de huecos desconocido: {gestor_huecos} "
+                                 f"(opciones: {', '.join(GESTORES_HUECOS)})")
+            gestor_huecos = GESTORES_HUECOS[gestor_huecos](*self.limites)
+        elif altura < profundidad:
+            # Un gestor ya creado abarca el bloque entero: se ocupa la franja
+            # por encima de la altura máxima
+            franja = np.array([(0, 0, altura + kerf, ancho + kerf, alto + kerf, profundidad - altura)],
+                              dtype=CAJA_DTYPE)
+            self.zonas = np.concatenate([self.zonas, franja])
+        self._aplazadas = []  # Piezas restauradas cuyos huecos aún no se han ocupado
+        self.gestor_huecos = gestor_huecos
+        for zona in self.zonas.tolist():
+            self.gestor_huecos.ocupar(*zona)
+        
+        # Índice espacial para acelerar la detección de colisiones
+        if isinstance(indice, str):
+            if indice not in INDICES_ESPACIALES:
+                raise ValueError(f"Índice espacial desconocido: {indice} "
+                                 f"(opciones: {', '.join(INDICES_ESPACIALES)})")
+            indice = INDICES_ESPACIALES[indice](ancho, alto, profundidad)
+        self.indice = indice
+    
+    @property
+    def gestor_huecos(self):
+        """Gestor del espacio libre (con las ocupaciones aplazadas por restaurar ya aplicadas)"""
+        if self._aplazadas:
+            aplazadas, self._aplazadas = self._aplazadas, []
+            for pieza in aplazadas:
+                self._actualizar_huecos(pieza, pieza.posicion)
+        return self._gestor_huecos
+    
+    @gestor_huecos.setter
+    def gestor_huecos(self, gestor):
+        self._gestor_huecos = gestor
+    
+    @property
+    def huecos(self) -> List[Tuple[float, float, float, float, float, float]]:
+        """
+        Huecos disponibles como tuplas (x, y, z, ancho, alto, prof), medidos en
+        el espacio ampliado con el kerf (una pieza cabe si sus lados más el
+        kerf caben en el hueco)
+        """
+        return self.gestor_huecos.huecos
+    
+    @property
+    def altura_maxima(self) -> Optional[float]:
+        """Altura máxima de corte (cm) de las restricciones"""
+        return self.restricciones.altura_maxima
+    
+    @property
+    def volumen_util(self) -> float:
+        """Volumen del bloque por debajo de la altura máxima de corte"""
+        return self.ancho * self.alto * (self.limites[2] - self.restricciones.kerf)
     
     def puede_colocar(self, pieza: Pieza, posicion: Tuple[float, float, float]) -> bool:
         """Verifica si una pieza puede colocarse en una posición"""
         x, y, z = posicion
+        kerf = self.restricciones.kerf
+        ancho, alto, prof = pieza.ancho + kerf, pieza.alto + kerf, pieza.profundidad + kerf
         
-        # Verificar límites del bloque
-        if (x + pieza.ancho > self.ancho or 
-            y + pieza.alto > self.alto or 
-            z + pieza.profundidad > self.profundidad):
+        # Verificar límites del bloque (incluye la altura máxima de corte)
+        if (x + ancho > self.limites[0] or
+            y + alto > self.limites[1] or
+            z + prof > self.limites[2]):
             return False
         
-        # Verificar límite de altura (150cm)
-        if z + pieza.profundidad > 150:
+        # Verificar zonas prohibidas
+        if len(self.zonas):
+            c = self.zonas
+            if np.any((c['x'] < x + ancho) & (x < c['x'] + c['ancho']) &
+                      (c['y'] < y + alto) & (y < c['y'] + c['alto']) &
+                      (c['z'] < z + prof) & (z < c['z'] + c['prof'])):
+                return False
+        
+        # El gestor de huecos puede exigir más (p. ej. que se pueda cortar)
+        if not self.gestor_huecos.admite(x, y, z, ancho, alto, prof):
             return False
         
-        # Verificar colisiones con otras piezas
-        for pieza_colocada in self.piezas_colocadas:
+        # Verificar colisiones con las piezas cercanas según el índice espacial
+        # (el índice guarda las piezas sin ampliar: se consulta con margen)
+        candidatas = self.indice.candidatas(x - kerf, y - kerf, z - kerf,
+                                            ancho + kerf, alto + kerf, prof + kerf)
+        for pieza_colocada in candidatas:
             if self._hay_colision(pieza, posicion, pieza_colocada):
                 return False
         
@@ -88,13 +1058,16 @@ class Bloque:
     
     def _hay_colision(self, pieza1: Pieza, pos1: Tuple[float, float, float], 
                      pieza2: Pieza) -> bool:
-        """Verifica si dos piezas se superponen"""
+        """Verifica si dos piezas se superponen (o quedan a menos del kerf)"""
         x1, y1, z1 = pos1
         x2, y2, z2 = pieza2.posicion
+        k = self.restricciones.kerf
         
-        return not (x1 + pieza1.ancho <= x2 or x2 + pieza2.ancho <= x1 or
-                   y1 + pieza1.alto <= y2 or y2 + pieza2.alto <= y1 or
-                   z1 + pieza1.profundidad <= z2 or z2 + pieza2.profundidad <= z1)
+        # Lado + kerf se suma primero, igual que al ocupar los huecos, para que
+        # dos piezas que se tocan en el espacio ampliado no choquen por redondeo
+        return not (x1 + (pieza1.ancho + k) <= x2 or x2 + (pieza2.ancho + k) <= x1 or
+                   y1 + (pieza1.alto + k) <= y2 or y2 + (pieza2.alto + k) <= y1 or
+                   z1 + (pieza1.profundidad + k) <= z2 or z2 + (pieza2.profundidad + k) <= z1)
     
     def colocar_pieza(self, pieza: Pieza, posicion: Tuple[float, float, float]) -> bool:
         """Coloca una pieza en el bloque"""
@@ -104,98 +1077,484 @@ class Bloque:
         pieza.posicion = posicion
         pieza.colocada = True
         self.piezas_colocadas.append(pieza)
+        self.indice.insertar(pieza)
         self.volumen_ocupado += pieza.volumen
         
         # Actualizar huecos disponibles
         self._actualizar_huecos(pieza, posicion)
         
+        for funcion in self.al_colocar:
+            funcion(pieza)
+        
         return True
     
+    def restaurar(self, colocaciones: Iterable[Tuple[Pieza, Tuple[float, float, float]]]):
+        """
+        Coloca piezas en posiciones ya validadas (p. ej. una solución guardada)
+        sin comprobarlas. La actualización de huecos, que es lo más caro, se
+        aplaza hasta que se vuelvan a necesitar (p. ej. para añadir piezas).
+        """
+        for pieza, posicion in colocaciones:
+            pieza.posicion = posicion
+            pieza.colocada = True
+            self.piezas_colocadas.append(pieza)
+            self.indice.insertar(pieza)
+            self.volumen_ocupado += pieza.volumen
+            self._aplazadas.append(pieza)
+            for funcion in self.al_colocar:
+                funcion(pieza)
+    
     def _actualizar_huecos(self, pieza: Pieza, posicion: Tuple[float, float, float]):
         """Actualiza la lista de huecos disponibles"""
         x, y, z = posicion
+        kerf = self.restricciones.kerf
+        self.gestor_huecos.ocupar(x, y, z, pieza.ancho + kerf, pieza.alto + kerf,
+                                  pieza.profundidad + kerf)
+    
+    def retirar_piezas(self, piezas: Iterable[Pieza]) -> List[Pieza]:
+        """
+        Retira piezas colocadas (las copias orientadas o las piezas originales),
+        devuelve su volumen a los huecos y devuelve las que no estaban colocadas
+        """
+        por_id = {}
+        for colocada in self.piezas_colocadas:
+            por_id[id(colocada)] = colocada
+            if colocada.origen is not None:
+                por_id[id(colocada.origen)] = colocada
         
-        # Dividir huecos existentes
-        nuevos_huecos = []
-        for hueco in self.huecos:
-            hx, hy, hz, hancho, halto, hprof = hueco
-            
-            # Si el hueco se superpone con la pieza, dividirlo
-            if not (x + pieza.ancho <= hx or hx + hancho <= x or
-                   y + pieza.alto <= hy or hy + halto <= y or
-                   z + pieza.profundidad <= hz or hz + hprof <= z):
-                
-                # Crear nuevos huecos alrededor de la pieza colocada
-                if hx < x:
-                    nuevos_huecos.append((hx, hy, hz, x - hx, halto, hprof))
-                if hx + hancho > x + pieza.ancho:
-                    nuevos_huecos.append((x + pieza.ancho, hy, hz, 
-                                        hx + hancho - (x + pieza.ancho), halto, hprof))
-                if hy < y:
-                    nuevos_huecos.append((max(hx, x), hy, hz, 
-                                        min(hancho, x + pieza.ancho - max(hx, x)), 
-                                        y - hy, hprof))
-                if hy + halto > y + pieza.alto:
-                    nuevos_huecos.append((max(hx, x), y + pieza.alto, hz, 
-                                        min(hancho, x + pieza.ancho - max(hx, x)), 
-                                        hy + halto - (y + pieza.alto), hprof))
-                if hz < z:
-                    nuevos_huecos.append((max(hx, x), max(hy, y), hz, 
-                                        min(hancho, x + pieza.ancho - max(hx, x)), 
-                                        min(halto, y + pieza.alto - max(hy, y)), 
-                                        z - hz))
-                if hz + hprof > z + pieza.profundidad:
-                    nuevos_huecos.append((max(hx, x), max(hy, y), z + pieza.profundidad, 
-                                        min(hancho, x + pieza.ancho - max(hx, x)), 
-                                        min(halto, y + pieza.alto - max(hy, y)), 
-                                        hz + hprof - (z + pieza.profundidad)))
-            else:
-                nuevos_huecos.append(hueco)
+        ausentes = []
+        for pieza in piezas:
+            colocada = por_id.pop(id(pieza), None)
+            if colocada is None or colocada.posicion is None:
+                ausentes.append(pieza)
+                continue
+            kerf = self.restricciones.kerf
+            caja = (*colocada.posicion, colocada.ancho + kerf, colocada.alto + kerf,
+                    colocada.profundidad + kerf)
+            self.piezas_colocadas.remove(colocada)
+            self.indice.retirar(colocada)
+            self.volumen_ocupado -= colocada.volumen
+            colocada.posicion = None
+            colocada.colocada = False
+            self.gestor_huecos.liberar(caja, self._cajas_ocupadas())
+        return ausentes
+    
+    def _cajas_ocupadas(self) -> np.ndarray:
+        """Zonas prohibidas y cajas (ampliadas con el kerf) de las piezas colocadas"""
+        kerf = self.restricciones.kerf
+        piezas = np.array([(*p.posicion, p.ancho + kerf, p.alto + kerf, p.profundidad + kerf)
+                           for p in self.piezas_colocadas], dtype=CAJA_DTYPE)
+        return np.concatenate([self.zonas, piezas])
+    
+    def reconstruir_huecos(self, lado_minimo: Optional[float] = None):
+        """
+        Recalcula los huecos desde el bloque vacío ocupando las piezas colocadas
+        (por ejemplo para recuperar huecos descartados por lado_minimo)
+        """
+        anterior = self._gestor_huecos
+        self._aplazadas = []  # Las piezas restauradas entran con las demás
+        self.gestor_huecos = type(anterior)(*self.limites)
+        self.gestor_huecos.lado_minimo = anterior.lado_minimo if lado_minimo is None else lado_minimo
+        for caja in self._cajas_ocupadas().tolist():
+            self.gestor_huecos.ocupar(*caja)
+    
+    def vaciar(self):
+        """Retira todas las piezas dejando el bloque como recién creado"""
+        self.piezas_colocadas = []
+        self.volumen_ocupado = 0
+        self.indice.vaciar()  # Conserva la configuración del índice (p. ej. tam_celda)
+        self.reconstruir_huecos()
+    
+    def secuencia_cortes(self) -> List[Dict]:
+        """
+        Cortes de sierra, en orden, para obtener las piezas colocadas (solo con
+        gestor_huecos='guillotina').
         
-        self.huecos = [h for h in nuevos_huecos if h[3] > 0 and h[4] > 0 and h[5] > 0]
+        Cada corte indica el eje, la posición y la región que parte. Con kerf la
+        hoja retira el material entre posicion y posicion + kerf. Si el árbol
+        de cortes empieza por debajo de la profundidad del bloque (altura
+        máxima), el primer corte separa esa franja superior.
+        """
+        if not hasattr(self.gestor_huecos, 'cortes'):
+            raise ValueError("La secuencia de cortes necesita gestor_huecos='guillotina' "
+                             f"(opciones: {', '.join(GESTORES_HUECOS)})")
+        kerf = self.restricciones.kerf
+        # Un gestor creado por el bloque ya excluye la franja (un gestor dado
+        # abarca el bloque entero y la corta al ocuparla como zona)
+        altura = min(self.gestor_huecos.dimensiones[2] - kerf, self.profundidad)
+        dims = (self.limites[0] - kerf, self.limites[1] - kerf, altura)
+        secuencia = []
+        if altura < self.profundidad:
+            secuencia.append({'eje': _EJES[2], 'posicion': altura,
+                              'region': (0, 0, 0, self.ancho, self.alto, self.profundidad)})
+        for corte in self.gestor_huecos.cortes():
+            # Del espacio ampliado con el kerf a coordenadas del bloque
+            lo = corte['region'][:3]
+            lados = tuple(min(lo[i] + corte['region'][3 + i], dims[i]) - lo[i] for i in range(3))
+            secuencia.append({'eje': corte['eje'], 'posicion': corte['posicion'] - kerf,
+                              'region': (*lo, *lados)})
+        return secuencia
     
     def calcular_eficiencia(self) -> float:
         """Calcula el porcentaje de eficiencia del bloque"""
         return (self.volumen_ocupado / self.volumen_total) * 100
+    
+    def copiar(self) -> 'Bloque':
+        """Copia independiente del estado del bloque (las piezas colocadas se comparten)"""
+        copia = copy.copy(self)
+        copia.piezas_colocadas = list(self.piezas_colocadas)
+        copia.al_colocar = []  # Las copias son estados de trabajo: no notifican
+        compartidas = {id(p): p for p in self.piezas_colocadas}
+        copia.gestor_huecos = copy.deepcopy(self.gestor_huecos, compartidas)
+        copia._aplazadas = []  # Ya aplicadas al gestor copiado
+        copia.indice = copy.deepcopy(self.indice, compartidas)
+        return copia
+
+def _criterio_primer_hueco(dims: np.ndarray, huecos: np.ndarray, bloque: Bloque) -> List[np.ndarray]:
+    """Primer hueco válido en el orden de la lista de huecos"""
+    return []
+
+def _criterio_z_minima(dims: np.ndarray, huecos: np.ndarray, bloque: Bloque) -> List[np.ndarray]:
+    """Hueco más bajo y, a igualdad, más cerca de la esquina (abajo-izquierda-fondo)"""
+    return [huecos['z'], huecos['y'], huecos['x']]
+
+def _criterio_ajuste_volumen(dims: np.ndarray, huecos: np.ndarray, bloque: Bloque) -> List[np.ndarray]:
+    """Hueco que menos volumen deja libre alrededor de la pieza"""
+    return [huecos['ancho'] * huecos['alto'] * huecos['prof']]
+
+def _holguras(dims: np.ndarray, huecos: np.ndarray, bloque: Bloque) -> List[np.ndarray]:
+    """Espacio que sobra en cada eje (k, n) al poner cada orientación en cada hueco"""
+    kerf = bloque.restricciones.kerf
+    return [huecos[lado] - (dims[:, i:i + 1] + kerf) for i, lado in enumerate(_LADOS)]
+
+def _criterio_contacto(dims: np.ndarray, huecos: np.ndarray, bloque: Bloque) -> List[np.ndarray]:
+    """
+    Orientación y hueco con más superficie de contacto.
+    
+    Las caras de un hueco están sobre una pared o una pieza, así que una cara
+    de la pieza toca algo cuando la pieza llena el hueco en ese eje. Las tres
+    caras de la esquina del hueco siempre tocan y suman lo mismo en cualquier
+    orientación: solo cuentan las opuestas. Empates: abajo-izquierda-fondo.
+    """
+    kerf = bloque.restricciones.kerf
+    ancho, alto, prof = (dims[:, i:i + 1] + kerf for i in range(3))
+    caras = (alto * prof, ancho * prof, ancho * alto)
+    contacto = sum(np.where(holgura <= 1e-9, cara, 0.0)
+                   for holgura, cara in zip(_holguras(dims, huecos, bloque), caras))
+    return [-contacto, huecos['z'], huecos['y'], huecos['x']]
+
+def _criterio_min_desperdicio(dims: np.ndarray, huecos: np.ndarray, bloque: Bloque) -> List[np.ndarray]:
+    """
+    Orientación y hueco que menos espacio inservible dejan: las franjas del
+    hueco más estrechas que el lado más corto de las piezas del pedido.
+    Empates: el hueco más ajustado y después abajo-izquierda-fondo.
+    """
+    minimo = bloque.gestor_huecos.lado_minimo + bloque.restricciones.kerf
+    lados = [huecos[lado] for lado in _LADOS]
+    desperdicio = 0.0
+    for i, holgura in enumerate(_holguras(dims, huecos, bloque)):
+        seccion = lados[(i + 1) % 3] * lados[(i + 2) % 3]
+        desperdicio = desperdicio + np.where((holgura > 1e-9) & (holgura < minimo),
+                                             holgura * seccion, 0.0)
+    return [desperdicio, huecos['ancho'] * huecos['alto'] * huecos['prof'],
+            huecos['z'], huecos['y'], huecos['x']]
+
+# Criterios de elección de hueco para Optimizador3D(criterio=...).
+# Reciben las orientaciones de la pieza (k, 3), todos los huecos (n,) y el bloque,
+# y devuelven claves de puntuación en orden de prioridad: gana la más baja y los
+# empates se resuelven por el orden de la lista de huecos. Una clave (n,) puntúa
+# huecos (se prueba la primera orientación que cabe); si alguna es (k, n), se
+# puntúa cada par orientación-hueco. Abajo-izquierda-fondo es 'z_minima' y el
+# mejor ajuste por volumen, 'ajuste_volumen'.
+CRITERIOS_HUECO = {
+    'primer_hueco': _criterio_primer_hueco,
+    'z_minima': _criterio_z_minima,
+    'ajuste_volumen': _criterio_ajuste_volumen,
+    'contacto': _criterio_contacto,
+    'min_desperdicio': _criterio_min_desperdicio,
+}
+
+def _mejores(claves: List[np.ndarray], candidatos: np.ndarray) -> Iterable[int]:
+    """
+    Candidatos de mejor a peor según claves lexicográficas.
+    
+    El mejor sale de un mínimo vectorizado por clave (lo habitual es que el
+    bloque lo acepte). Si se piden más, los restantes se ordenan una sola vez
+    como cola de prioridad en lugar de repetir el mínimo por cada rechazo.
+    """
+    if not claves:
+        yield from candidatos
+        return
+    seleccion = candidatos
+    for clave in claves:
+        valores = clave[seleccion]
+        seleccion = seleccion[valores == valores.min()]
+    mejor = seleccion[0]
+    yield mejor
+    # lexsort es estable: a igualdad de claves se mantiene el orden de los huecos
+    cola = candidatos[np.lexsort([clave[candidatos] for clave in reversed(claves)])]
+    for candidato in cola:
+        if candidato != mejor:
+            yield candidato
+
+def _colocacion(pieza: Pieza) -> Dict:
+    """Datos serializables de una pieza colocada"""
+    original = pieza.origen or pieza
+    dimensiones = (pieza.ancho, pieza.alto, pieza.profundidad)
+    return {
+        'nombre': original.nombre,
+        'orientacion': original.orientaciones().index(dimensiones) if pieza.origen else 0,
+        'dimensiones': dimensiones,
+        'posicion': pieza.posicion,
+    }
 
 class Optimizador3D:
     """Clase principal del optimizador"""
     
-    def __init__(self, bloque: Bloque):
+    def __init__(self, bloque: Bloque, criterio: str = 'z_minima',
+                 umbral_reempaquetado: Optional[float] = None,
+                 cache: Optional['CacheColocaciones'] = None):
+        if criterio not in CRITERIOS_HUECO:
+            raise ValueError(f"Criterio desconocido: {criterio} "
+                             f"(opciones: {', '.join(CRITERIOS_HUECO)})")
         self.bloque = bloque
+        self.criterio = criterio
         self.piezas_no_colocadas = []
+        # Eficiencia (%) por debajo de la cual una edición del pedido provoca
+        # un reempaquetado completo (None = nunca)
+        self.umbral_reempaquetado = umbral_reempaquetado
+        # Soluciones de pedidos anteriores (solo para optimizar con el bloque vacío)
+        self.cache = cache
     
-    def optimizar(self, piezas: List[Pieza]) -> Dict:
-        """Algoritmo greedy para optimizar la colocación"""
-        piezas_ordenadas = sorted(piezas, key=lambda p: p.volumen, reverse=True)
+    def optimizar(self, piezas: Iterable[Pieza], ordenar: bool = True,
+                  orientaciones: Optional[List[int]] = None) -> Dict:
+        """
+        Algoritmo greedy para optimizar la colocación
         
-        for pieza in piezas_ordenadas:
-            colocada = False
-            
-            # Intentar diferentes rotaciones
-            for _ in range(6):
-                pieza_rotada = pieza.rotar()
-                
-                # Buscar en huecos disponibles
-                for hueco in self.bloque.huecos:
-                    hx, hy, hz, hancho, halto, hprof = hueco
-                    
-                    if (pieza_rotada.ancho <= hancho and 
-                        pieza_rotada.alto <= halto and 
-                        pieza_rotada.profundidad <= hprof):
-                        
-                        if self.bloque.colocar_pieza(pieza_rotada, (hx, hy, hz)):
-                            colocada = True
-                            break
-                
-                if colocada:
-                    break
+        Args:
+            piezas: Piezas a colocar. Con ordenar=False puede ser un iterador
+                (p. ej. leer_piezas): las piezas se colocan según llegan sin
+                cargar el pedido entero en memoria
+            ordenar: Colocar de mayor a menor volumen; si es False se respeta
+                el orden recibido
+            orientaciones: Orientación preferida de cada pieza (índice en
+                Pieza.orientaciones()); si así no cabe se prueban las demás
+        
+        Con caché, un pedido ya resuelto (el bloque vacío, una lista de piezas y
+        sin orientaciones preferidas) se restaura sin buscar huecos y el reporte
+        lleva desde_cache.
+        """
+        clave = None
+        if (self.cache is not None and orientaciones is None and hasattr(piezas, '__len__')
+                and not self.bloque.piezas_colocadas):
+            piezas = list(piezas)
+            clave, orden = self.cache.clave(self, piezas, ordenar)
+            canonicas = [piezas[i] for i in orden]
+            solucion = self.cache.obtener(clave)
+            if solucion is not None:
+                return self._restaurar(solucion, canonicas)
+        
+        if orientaciones is None:
+            orientaciones = itertools.repeat(None)
+        pares = zip(piezas, orientaciones)
+        if ordenar or hasattr(piezas, '__len__'):
+            pares = list(pares)
+            if ordenar:
+                pares.sort(key=lambda par: par[0].volumen, reverse=True)
             
-            if not colocada:
+            # Los huecos donde no cabe ni el lado más corto de ninguna pieza
+            # sobran (con un iterador no se conocen las piezas de antemano)
+            if pares:
+                self.bloque.gestor_huecos.lado_minimo = min(
+                    min(p.ancho, p.alto, p.profundidad) for p, _ in pares)
+        
+        for pieza, preferida in pares:
+            if not self._colocar(pieza, preferida):
                 self.piezas_no_colocadas.append(pieza)
         
+        reporte = self._generar_reporte()
+        if clave is not None:
+            self.cache.guardar(clave, self._solucion(canonicas))
+            reporte['desde_cache'] = False
+        return reporte
+    
+    def _solucion(self, canonicas: List[Pieza]) -> Dict:
+        """
+        Resultado para la caché: [índice, orientación, x, y, z] de cada colocación
+        e índices de las no colocadas, referidos al orden canónico de las piezas
+        """
+        indices = {id(pieza): i for i, pieza in enumerate(canonicas)}
+        return {
+            'colocadas': [[indices[id(p.origen or p)], _colocacion(p)['orientacion'], *p.posicion]
+                          for p in self.bloque.piezas_colocadas],
+            'no_colocadas': [indices[id(p)] for p in self.piezas_no_colocadas if id(p) in indices],
+        }
+    
+    def _restaurar(self, solucion: Dict, canonicas: List[Pieza]) -> Dict:
+        """Coloca una solución de la caché en el bloque sin buscar huecos"""
+        if canonicas:
+            # El mismo lado mínimo que al optimizar, por si luego se añaden piezas
+            self.bloque.gestor_huecos.lado_minimo = min(
+                min(p.ancho, p.alto, p.profundidad) for p in canonicas)
+        self.bloque.restaurar((canonicas[i].orientada(orientacion), (x, y, z))
+                              for i, orientacion, x, y, z in solucion['colocadas'])
+        self.piezas_no_colocadas.extend(canonicas[i] for i in solucion['no_colocadas'])
+        reporte = self._generar_reporte()
+        reporte['desde_cache'] = True
+        return reporte
+    
+    def agregar(self, piezas: List[Pieza]) -> Dict:
+        """
+        Añade piezas a un pedido ya optimizado probando solo el espacio libre
+        actual; las piezas ya colocadas no se mueven
+        """
+        piezas = sorted(piezas, key=lambda p: p.volumen, reverse=True)
+        if piezas:
+            # Si llegan piezas más pequeñas, recuperar los huecos que se descartaron
+            lado = min(min(p.ancho, p.alto, p.profundidad) for p in piezas)
+            if lado < self.bloque.gestor_huecos.lado_minimo:
+                self.bloque.reconstruir_huecos(lado)
+        
+        self.piezas_no_colocadas.extend(self._colocar_pendientes(piezas))
+        return self._revisar_eficiencia()
+    
+    def retirar(self, piezas: List[Pieza]) -> Dict:
+        """
+        Quita piezas del pedido liberando su volumen; después se intenta colocar
+        en el espacio liberado las piezas que se habían quedado fuera
+        """
+        ausentes = {id(p) for p in self.bloque.retirar_piezas(piezas)}
+        pendientes = [p for p in self.piezas_no_colocadas if id(p) not in ausentes]
+        self.piezas_no_colocadas = self._colocar_pendientes(pendientes)
+        return self._revisar_eficiencia()
+    
+    def _colocar_pendientes(self, piezas: List[Pieza]) -> List[Pieza]:
+        """
+        Intenta colocar las piezas en el espacio libre actual y devuelve las que
+        no caben. El espacio libre solo se reduce durante la pasada, así que
+        unas dimensiones que ya fallaron no se vuelven a probar.
+        """
+        no_colocadas = []
+        fallidas = set()
+        for pieza in piezas:
+            clave = (pieza.ancho, pieza.alto, pieza.profundidad, pieza.ejes_rotacion)
+            if clave in fallidas or not self._colocar(pieza):
+                fallidas.add(clave)
+                no_colocadas.append(pieza)
+        return no_colocadas
+    
+    def reempaquetar(self) -> Dict:
+        """
+        Vuelve a optimizar desde cero todas las piezas del pedido y se queda con
+        el resultado si coloca más volumen que el actual
+        
+        Los avisos de bloque.al_colocar se suspenden mientras se prueba: si se
+        descarta no se avisa de nada y, si se acepta, solo de las colocaciones
+        nuevas o que han cambiado (las piezas movidas se avisan otra vez con
+        su nueva posición).
+        """
+        piezas = [p.origen or p for p in self.bloque.piezas_colocadas] + self.piezas_no_colocadas
+        anterior = self.bloque.copiar()
+        anteriores_no_colocadas = self.piezas_no_colocadas
+        avisadas = {self._huella(p) for p in self.bloque.piezas_colocadas}
+        al_colocar, self.bloque.al_colocar = self.bloque.al_colocar, []
+        
+        try:
+            self.bloque.vaciar()
+            self.piezas_no_colocadas = []
+            self.optimizar(piezas)
+            
+            if self.bloque.volumen_ocupado < anterior.volumen_ocupado:
+                self.bloque = anterior
+                self.piezas_no_colocadas = anteriores_no_colocadas
+            else:
+                for pieza in self.bloque.piezas_colocadas:
+                    if self._huella(pieza) not in avisadas:
+                        for funcion in al_colocar:
+                            funcion(pieza)
+        finally:
+            self.bloque.al_colocar = al_colocar
         return self._generar_reporte()
     
+    @staticmethod
+    def _huella(pieza: Pieza) -> Tuple:
+        """Identifica una colocación: pieza original, orientación y posición"""
+        return (id(pieza.origen or pieza), pieza.ancho, pieza.alto, pieza.profundidad, pieza.posicion)
+    
+    def _revisar_eficiencia(self) -> Dict:
+        """Reempaqueta tras una edición si hay piezas fuera y la eficiencia cae del umbral"""
+        if (self.umbral_reempaquetado is not None and self.piezas_no_colocadas and
+                self.bloque.calcular_eficiencia() < self.umbral_reempaquetado):
+            return self.reempaquetar()
+        return self._generar_reporte()
+    
+    def _colocar(self, pieza: Pieza, preferida: Optional[int] = None) -> bool:
+        """Coloca una pieza en el mejor hueco según el criterio configurado"""
+        if preferida is not None:
+            for orientacion, posicion, _ in self._candidatos(pieza, [preferida]):
+                if self.bloque.colocar_pieza(pieza.orientada(orientacion), posicion):
+                    return True
+        for orientacion, posicion, _ in self._candidatos(pieza):
+            if self.bloque.colocar_pieza(pieza.orientada(orientacion), posicion):
+                return True
+        return False
+    
+    def _candidatos(self, pieza: Pieza, orientaciones: Optional[List[int]] = None
+                    ) -> Iterator[Tuple[int, Tuple[float, float, float], float]]:
+        """
+        Posibles colocaciones (orientación, posición, volumen del hueco) de mejor
+        a peor según el criterio configurado.
+        
+        Todas las combinaciones (orientación, hueco) se evalúan con una única
+        comparación vectorizada; para cada hueco se propone la primera orientación
+        que cabe (de entre las indicadas, o todas). El bloque todavía puede
+        rechazar la colocación.
+        """
+        huecos = self.bloque.gestor_huecos.cajas
+        if not len(huecos):
+            return
+        
+        # Orientaciones distintas de la pieza (en caché, sin crear objetos)
+        # que permiten las restricciones del bloque
+        dims = pieza.matriz_orientaciones()
+        permitidas = self.bloque.restricciones.indices_orientacion(pieza)
+        if permitidas is not None:
+            orientaciones = permitidas if orientaciones is None else [
+                o for o in orientaciones if o in permitidas]
+        if orientaciones is None:
+            orientaciones = range(len(dims))
+        else:
+            if not len(orientaciones):
+                return
+            dims = dims[orientaciones]
+        
+        # cabe[r, h]: la orientación r (más el kerf) entra en el hueco h. La
+        # altura máxima y las zonas prohibidas ya están descontadas de los huecos
+        kerf = self.bloque.restricciones.kerf
+        cabe = ((dims[:, 0:1] + kerf <= huecos['ancho']) &
+                (dims[:, 1:2] + kerf <= huecos['alto']) &
+                (dims[:, 2:3] + kerf <= huecos['prof']))
+        candidatos = np.flatnonzero(cabe.any(axis=0))
+        if not len(candidatos):
+            return
+        
+        claves = CRITERIOS_HUECO[self.criterio](dims, huecos, self.bloque)
+        if all(clave.ndim == 1 for clave in claves):
+            # Claves por hueco: la primera orientación que cabe en cada uno
+            pares = ((int(np.argmax(cabe[:, h])), h) for h in _mejores(claves, candidatos))
+        else:
+            # Claves por par orientación-hueco (solo los pares que caben)
+            pares_h, pares_r = np.nonzero(cabe.T)
+            claves = [clave[pares_h] if clave.ndim == 1 else clave[pares_r, pares_h]
+                      for clave in claves]
+            pares = ((int(pares_r[i]), pares_h[i])
+                     for i in _mejores(claves, np.arange(len(pares_h))))
+        for r, h in pares:
+            hueco = huecos[h]
+            yield (orientaciones[r],
+                   (hueco['x'].item(), hueco['y'].item(), hueco['z'].item()),
+                   (hueco['ancho'] * hueco['alto'] * hueco['prof']).item())
+    
     def _generar_reporte(self) -> Dict:
         """Genera un reporte de la optimización"""
         return {
@@ -206,32 +1565,1002 @@ class Optimizador3D:
             'volumen_total': self.bloque.volumen_total
         }
     
-    def visualizar(self):
-        """Crea una visualización 3D del resultado"""
-        fig = plt.figure(figsize=(12, 8))
-        ax = fig.add_subplot(111, projection='3d')
+    def colocaciones(self) -> List[Dict]:
+        """Lista serializable de las piezas colocadas con su orientación y posición"""
+        return [_colocacion(pieza) for pieza in self.bloque.piezas_colocadas]
+    
+    def visualizar(self, archivo: Optional[str] = None, max_etiquetas: int = 100):
+        """Crea una visualización 3D del resultado (ver dibujar_bloque)"""
+        dibujar_bloque(self.bloque, archivo, max_etiquetas)
+    
+    def exportar_obj(self, archivo: str):
+        """Exporta el resultado como malla Wavefront OBJ (ver exportar_obj)"""
+        exportar_obj(self.bloque, archivo)
+
+# Estado de cada proceso que evalúa cromosomas (lo rellena _iniciar_evaluador)
+_CONTEXTO_EVALUADOR = {}
+
+def _iniciar_evaluador(dims_bloque: Tuple[float, float, float], restricciones: Restricciones,
+                       gestor_huecos: str, piezas: List[Tuple], criterio: str):
+    """Prepara un proceso evaluador: las piezas se crean una sola vez por proceso"""
+    _CONTEXTO_EVALUADOR.update(
+        dims_bloque=dims_bloque,
+        restricciones=restricciones,
+        gestor_huecos=gestor_huecos,
+        piezas=[Pieza(*datos) for datos in piezas],
+        criterio=criterio,
+    )
+
+def _argumentos_evaluador(bloque: Bloque, piezas: List[Pieza], criterio: str) -> Tuple:
+    """Argumentos de _iniciar_evaluador para replicar el bloque en otro proceso"""
+    # Los evaluadores usan el mismo tipo de gestor que el bloque propio
+    gestor = _nombre_gestor(bloque.gestor_huecos) or 'maximales'
+    return ((bloque.ancho, bloque.alto, bloque.profundidad), bloque.restricciones, gestor,
+            [_pieza_a_tupla(p) for p in piezas], criterio)
+
+def _decodificar(cromosoma: Tuple[List[int], List[Optional[int]]]) -> Optimizador3D:
+    """Coloca las piezas en el orden y con las orientaciones del cromosoma (None: sin preferida)"""
+    orden, orientaciones = cromosoma
+    contexto = _CONTEXTO_EVALUADOR
+    bloque = Bloque(*contexto['dims_bloque'], gestor_huecos=contexto['gestor_huecos'],
+                    restricciones=contexto['restricciones'])
+    optimizador = Optimizador3D(bloque, criterio=contexto['criterio'])
+    piezas = contexto['piezas']
+    optimizador.optimizar([piezas[i] for i in orden], ordenar=False,
+                          orientaciones=[orientaciones[i] for i in orden])
+    return optimizador
+
+def _evaluar_cromosoma(cromosoma: Tuple[List[int], List[Optional[int]]]) -> float:
+    """Aptitud de un cromosoma: eficiencia del bloque decodificado"""
+    return _decodificar(cromosoma).bloque.calcular_eficiencia()
+
+class OptimizadorGenetico(Optimizador3D):
+    """
+    Búsqueda del orden y la orientación de las piezas con un algoritmo genético.
+    
+    Cada cromosoma guarda una permutación de las piezas y una orientación
+    preferida por pieza (None = ninguna); se decodifica con la colocación greedy
+    de Optimizador3D y su aptitud es la eficiencia del bloque resultante. La
+    población inicial incluye la solución greedy y se guarda el mejor individuo
+    visto, así que el resultado nunca es peor que ella.
+    La mejor solución encontrada queda colocada en self.bloque.
+    
+    Con la misma semilla y el mismo número de generaciones el resultado es
+    reproducible; con tiempo_max depende de cuántas generaciones dé tiempo a hacer.
+    """
+    
+    def __init__(self, bloque: Bloque, criterio: str = 'z_minima',
+                 poblacion: int = 30, generaciones: int = 50,
+                 tiempo_max: Optional[float] = None, prob_mutacion: float = 0.1,
+                 elite: int = 2, workers: Optional[int] = None,
+                 semilla: Optional[int] = None):
+        """
+        Args:
+            bloque: Bloque (vacío) donde se colocará la mejor solución
+            criterio: Criterio de elección de hueco al decodificar
+            poblacion: Individuos por generación
+            generaciones: Máximo de generaciones
+            tiempo_max: Segundos máximos de búsqueda (None = sin límite)
+            prob_mutacion: Probabilidad de mutar cada gen
+            elite: Mejores individuos que pasan intactos a la siguiente generación
+            workers: Procesos para evaluar la aptitud (1 = sin procesos auxiliares)
+            semilla: Semilla del generador aleatorio
+        """
+        super().__init__(bloque, criterio)
+        self.poblacion = poblacion
+        self.generaciones = generaciones
+        self.tiempo_max = tiempo_max
+        self.prob_mutacion = prob_mutacion
+        self.elite = elite
+        self.workers = workers
+        self.rng = random.Random(semilla)
+        self.historial = []  # Mejor eficiencia de cada generación
+    
+    def optimizar(self, piezas: List[Pieza]) -> Dict:
+        """Ejecuta el algoritmo genético y coloca la mejor solución en el bloque"""
+        inicio = time.perf_counter()
+        n = len(piezas)
+        argumentos = _argumentos_evaluador(self.bloque, piezas, self.criterio)
+        num_orientaciones = [len(p.orientaciones()) for p in piezas]
         
-        # Dibujar el bloque
-        ax.bar3d(0, 0, 0, self.bloque.ancho, self.bloque.alto, self.bloque.profundidad,
-                alpha=0.1, color='gray', edgecolor='black')
+        # Individuo greedy: de mayor a menor volumen sin orientación preferida
+        greedy = (sorted(range(n), key=lambda i: piezas[i].volumen, reverse=True), [None] * n)
+        poblacion = [greedy] + [self._aleatorio(num_orientaciones)
+                                for _ in range(self.poblacion - 1)]
         
-        # Dibujar las piezas colocadas
-        for pieza in self.bloque.piezas_colocadas:
-            x, y, z = pieza.posicion
-            ax.bar3d(x, y, z, pieza.ancho, pieza.alto, pieza.profundidad,
-                    alpha=0.8, color=pieza.color, edgecolor='black')
-            
-            # Etiqueta de la pieza
-            ax.text(x + pieza.ancho/2, y + pieza.alto/2, z + pieza.profundidad/2,
-                   pieza.nombre, fontsize=8, ha='center')
+        executor = None
+        if self.workers != 1:
+            from concurrent.futures import ProcessPoolExecutor  # Solo si hay procesos
+            executor = ProcessPoolExecutor(max_workers=self.workers,
+                                           initializer=_iniciar_evaluador, initargs=argumentos)
+        else:
+            _iniciar_evaluador(*argumentos)
+        try:
+            aptitudes = self._evaluar(poblacion, executor)
+            mejor = max(range(len(poblacion)), key=aptitudes.__getitem__)
+            mejor, mejor_aptitud = poblacion[mejor], aptitudes[mejor]
+            for _ in range(self.generaciones):
+                if self.tiempo_max is not None and time.perf_counter() - inicio >= self.tiempo_max:
+                    break
+                poblacion, aptitudes = self._siguiente_generacion(
+                    poblacion, aptitudes, num_orientaciones, executor)
+                self.historial.append(max(aptitudes))
+                # Sin élite la mejor solución puede perderse entre generaciones
+                i = max(range(len(poblacion)), key=aptitudes.__getitem__)
+                if aptitudes[i] > mejor_aptitud:
+                    mejor, mejor_aptitud = poblacion[i], aptitudes[i]
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        
+        # Colocar la mejor solución en el bloque propio
+        orden, orientaciones = mejor
+        self.piezas_no_colocadas = []
+        super().optimizar([piezas[i] for i in orden], ordenar=False,
+                          orientaciones=[orientaciones[i] for i in orden])
+        
+        reporte = self._generar_reporte()
+        reporte['generaciones'] = len(self.historial)
+        reporte['tiempo'] = time.perf_counter() - inicio
+        return reporte
+    
+    def _evaluar(self, poblacion: List[Tuple], executor) -> List[float]:
+        """Aptitud de cada individuo, en paralelo si hay procesos auxiliares"""
+        if executor is None:
+            return [_evaluar_cromosoma(c) for c in poblacion]
+        trozo = max(1, len(poblacion) // (4 * (self.workers or os.cpu_count() or 1)))
+        return list(executor.map(_evaluar_cromosoma, poblacion, chunksize=trozo))
+    
+    def _aleatorio(self, num_orientaciones: List[int]) -> Tuple[List[int], List[int]]:
+        """Cromosoma con orden y orientaciones al azar"""
+        orden = list(range(len(num_orientaciones)))
+        self.rng.shuffle(orden)
+        return orden, [self.rng.randrange(k) for k in num_orientaciones]
+    
+    def _torneo(self, poblacion: List[Tuple], aptitudes: List[float], k: int = 3) -> Tuple:
+        """Selección por torneo entre k individuos"""
+        elegidos = self.rng.sample(range(len(poblacion)), min(k, len(poblacion)))
+        return poblacion[max(elegidos, key=aptitudes.__getitem__)]
+    
+    def _cruzar(self, padre: Tuple, madre: Tuple) -> Tuple[List[int], List[Optional[int]]]:
+        """Cruce de orden (OX) para la permutación y uniforme para las orientaciones"""
+        orden_p, orient_p = padre
+        orden_m, orient_m = madre
+        n = len(orden_p)
+        if n < 2:
+            return list(orden_p), list(orient_p)
+        a, b = sorted(self.rng.sample(range(n + 1), 2))
+        tramo = orden_p[a:b]
+        en_tramo = set(tramo)
+        resto = [g for g in orden_m if g not in en_tramo]
+        orden = resto[:a] + tramo + resto[a:]
+        orientaciones = [p if self.rng.random() < 0.5 else m for p, m in zip(orient_p, orient_m)]
+        return orden, orientaciones
+    
+    def _mutar(self, cromosoma: Tuple, num_orientaciones: List[int]) -> Tuple[List[int], List[Optional[int]]]:
+        """Intercambia posiciones del orden y cambia orientaciones al azar"""
+        orden, orientaciones = cromosoma
+        n = len(orden)
+        for i in range(n):
+            if n > 1 and self.rng.random() < self.prob_mutacion:
+                j = self.rng.randrange(n)
+                orden[i], orden[j] = orden[j], orden[i]
+            if self.rng.random() < self.prob_mutacion:
+                orientaciones[i] = self.rng.randrange(num_orientaciones[i])
+        return orden, orientaciones
+    
+    def _siguiente_generacion(self, poblacion: List[Tuple], aptitudes: List[float],
+                              num_orientaciones: List[int], executor) -> Tuple[List, List[float]]:
+        """Elitismo + torneo, cruce y mutación"""
+        ranking = sorted(range(len(poblacion)), key=aptitudes.__getitem__, reverse=True)
+        elite = [poblacion[i] for i in ranking[:self.elite]]
+        elite_aptitudes = [aptitudes[i] for i in ranking[:self.elite]]
+        
+        hijos = []
+        while len(elite) + len(hijos) < self.poblacion:
+            hijo = self._cruzar(self._torneo(poblacion, aptitudes),
+                                self._torneo(poblacion, aptitudes))
+            hijos.append(self._mutar(hijo, num_orientaciones))
+        
+        return elite + hijos, elite_aptitudes + self._evaluar(hijos, executor)
+
+def _cromosoma_arranque(semilla: Optional[int], piezas: List[Pieza],
+                        ruido: float) -> Tuple[List[int], List[Optional[int]]]:
+    """
+    Orden y orientaciones de un arranque: de mayor a menor volumen, con el volumen
+    multiplicado por un factor al azar en [1 - ruido, 1 + ruido], y una orientación
+    preferida al azar por pieza. Sin semilla es el greedy normal: el mismo orden
+    y ninguna orientación preferida (None).
+    """
+    n = len(piezas)
+    if semilla is None:
+        return sorted(range(n), key=lambda i: piezas[i].volumen, reverse=True), [None] * n
+    rng = random.Random(semilla)
+    factores = [1 + ruido * rng.uniform(-1, 1) for _ in range(n)]
+    orden = sorted(range(n), key=lambda i: piezas[i].volumen * factores[i], reverse=True)
+    return orden, [rng.randrange(len(p.orientaciones())) for p in piezas]
+
+def _evaluar_arranque(semilla: Optional[int], ruido: float) -> float:
+    """Eficiencia de un arranque con las piezas del proceso evaluador"""
+    cromosoma = _cromosoma_arranque(semilla, _CONTEXTO_EVALUADOR['piezas'], ruido)
+    return _evaluar_cromosoma(cromosoma)
+
+def _terminar_procesos(executor):
+    """Cierra un ProcessPoolExecutor sin esperar: cancela lo pendiente y termina lo que esté en curso"""
+    if hasattr(executor, 'terminate_workers'):  # Python 3.14+
+        executor.terminate_workers()
+        return
+    procesos = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for proceso in procesos:
+        proceso.terminate()
+    for proceso in procesos:
+        proceso.join()
+
+class OptimizadorMultiArranque(Optimizador3D):
+    """
+    Greedy aleatorizado con varios arranques independientes en paralelo.
+    
+    Cada arranque coloca las piezas con el greedy de Optimizador3D en un orden y
+    con unas orientaciones preferidas perturbados a partir de su propia semilla
+    (ver _cromosoma_arranque); se queda el mejor. El primer arranque es el greedy
+    sin perturbar, así que el resultado nunca es peor que él.
+    
+    Los procesos reciben las piezas una sola vez como tuplas; por cada arranque
+    solo viajan una semilla y una eficiencia. La búsqueda para en cuanto un
+    arranque alcanza eficiencia_objetivo o se agota tiempo_max: los procesos
+    se terminan en ese momento y sus arranques en curso se descartan (con
+    workers=1 el arranque en curso acaba antes de parar). La mejor solución
+    se vuelve a colocar en self.bloque después de la búsqueda; esa colocación
+    dura lo que un arranque y no cuenta en tiempo_max (el reporte separa
+    'tiempo_busqueda' del 'tiempo' total).
+    """
+    
+    def __init__(self, bloque: Bloque, criterio: str = 'z_minima', arranques: int = 32,
+                 ruido: float = 0.3, eficiencia_objetivo: Optional[float] = None,
+                 tiempo_max: Optional[float] = None, workers: Optional[int] = None,
+                 semilla: Optional[int] = None):
+        """
+        Args:
+            bloque: Bloque (vacío) donde se colocará la mejor solución
+            criterio: Criterio de elección de hueco de cada arranque
+            arranques: Número máximo de arranques (incluido el greedy)
+            ruido: Perturbación relativa del volumen al ordenar las piezas
+            eficiencia_objetivo: Eficiencia (%) a partir de la cual se para
+            tiempo_max: Segundos máximos de búsqueda, sin la colocación final
+                (None = sin límite)
+            workers: Procesos para los arranques (1 = sin procesos auxiliares)
+            semilla: Semilla de la que se derivan las de los arranques
+        """
+        super().__init__(bloque, criterio)
+        if arranques < 1:
+            raise ValueError("Se necesita al menos un arranque")
+        self.arranques = arranques
+        self.ruido = ruido
+        self.eficiencia_objetivo = eficiencia_objetivo
+        self.tiempo_max = tiempo_max
+        self.workers = workers
+        self.semilla = semilla
+        self.historial = []  # (semilla, eficiencia) de cada arranque terminado
+    
+    def optimizar(self, piezas: List[Pieza]) -> Dict:
+        """Ejecuta los arranques y coloca el mejor en el bloque"""
+        inicio = time.perf_counter()
+        piezas = list(piezas)
+        argumentos = _argumentos_evaluador(self.bloque, piezas, self.criterio)
+        base = random.Random(self.semilla).randrange(2**32)
+        semillas = [None] + [base + i for i in range(1, self.arranques)]
+        self.historial = []
+        
+        def restante() -> Optional[float]:
+            if self.tiempo_max is None:
+                return None
+            return max(0.0, self.tiempo_max - (time.perf_counter() - inicio))
+        
+        def objetivo_alcanzado() -> bool:
+            return (self.eficiencia_objetivo is not None and
+                    max(e for _, e in self.historial) >= self.eficiencia_objetivo)
+        
+        if self.workers == 1 or self.arranques == 1:
+            _iniciar_evaluador(*argumentos)
+            for semilla in semillas:
+                self.historial.append((semilla, _evaluar_arranque(semilla, self.ruido)))
+                if objetivo_alcanzado() or restante() == 0:
+                    break
+        else:
+            # Solo si hay procesos. concurrent.futures.TimeoutError es el
+            # TimeoutError de Python a partir de 3.11, pero antes no
+            from concurrent.futures import (ProcessPoolExecutor, TimeoutError as PlazoAgotado,
+                                            as_completed)
+            executor = ProcessPoolExecutor(max_workers=self.workers,
+                                           initializer=_iniciar_evaluador, initargs=argumentos)
+            try:
+                futuros = {executor.submit(_evaluar_arranque, semilla, self.ruido): semilla
+                           for semilla in semillas}
+                for futuro in as_completed(futuros, timeout=restante()):
+                    self.historial.append((futuros[futuro], futuro.result()))
+                    if objetivo_alcanzado():
+                        break
+            except PlazoAgotado:
+                pass  # Se agotó tiempo_max: cuenta lo que haya terminado
+            finally:
+                _terminar_procesos(executor)
+        tiempo_busqueda = time.perf_counter() - inicio
+        
+        # El mejor arranque (a igualdad, el primero de la lista de semillas)
+        terminados = dict(self.historial)
+        mejor = max((s for s in semillas if s in terminados),
+                    key=lambda s: terminados[s]) if terminados else None
+        orden, orientaciones = _cromosoma_arranque(mejor, piezas, self.ruido)
+        self.piezas_no_colocadas = []
+        super().optimizar([piezas[i] for i in orden], ordenar=False,
+                          orientaciones=[orientaciones[i] for i in orden])
+        
+        reporte = self._generar_reporte()
+        reporte['arranques'] = len(self.historial)
+        reporte['semilla_mejor'] = mejor
+        reporte['tiempo_busqueda'] = tiempo_busqueda
+        reporte['tiempo'] = time.perf_counter() - inicio
+        return reporte
+
+class OptimizadorExacto(Optimizador3D):
+    """
+    Búsqueda exhaustiva acotada (ramificación y poda) para pedidos pequeños.
+    
+    Las piezas se deciden de mayor a menor volumen: cada una se coloca en uno de
+    sus mejores huecos (hasta max_ramas) o se descarta. Una rama se poda cuando
+    ni colocando todo lo que queda, limitado por el volumen libre del bloque
+    (volumen_total - volumen_ocupado, por debajo de la altura máxima), podría
+    superar la mejor solución conocida. Los estados equivalentes (mismas piezas
+    por decidir y mismos huecos) se memorizan para no explorarlos dos veces.
+    
+    La búsqueda parte de la solución greedy y, si se agota tiempo_max, devuelve
+    la mejor encontrada hasta entonces. Con max_ramas=None la búsqueda es exacta
+    sobre las posiciones de esquina de los huecos.
+    """
+    
+    def __init__(self, bloque: Bloque, criterio: str = 'z_minima',
+                 tiempo_max: Optional[float] = 10.0, max_ramas: Optional[int] = 4):
+        super().__init__(bloque, criterio)
+        self.tiempo_max = tiempo_max
+        self.max_ramas = max_ramas
+        self.nodos = 0  # Nodos explorados en la última búsqueda
+        self.completa = False  # True si la búsqueda terminó sin agotar el tiempo
+    
+    def optimizar(self, piezas: List[Pieza]) -> Dict:
+        """Busca la colocación de máximo volumen y la deja en el bloque"""
+        inicio = time.perf_counter()
+        self._limite = None if self.tiempo_max is None else inicio + self.tiempo_max
+        self._piezas = sorted(piezas, key=lambda p: p.volumen, reverse=True)
+        self._restante = [0.0] * (len(self._piezas) + 1)  # Volumen de las piezas i..n
+        for i in range(len(self._piezas) - 1, -1, -1):
+            self._restante[i] = self._restante[i + 1] + self._piezas[i].volumen
+        self._visitados = {}
+        self.nodos = 0
+        
+        # Cota inferior inicial: la solución greedy
+        vacio = self.bloque.copiar()
+        greedy = Optimizador3D(self.bloque.copiar(), self.criterio)
+        greedy.optimizar(self._piezas, ordenar=False)
+        self._mejor_volumen = greedy.bloque.volumen_ocupado
+        self._mejor = [(p.origen, p.origen.orientaciones().index((p.ancho, p.alto, p.profundidad)),
+                        p.posicion) for p in greedy.bloque.piezas_colocadas]
+        
+        if self._piezas:
+            vacio.gestor_huecos.lado_minimo = min(
+                min(p.ancho, p.alto, p.profundidad) for p in self._piezas)
+        try:
+            self._explorar(vacio, 0, [])
+            self.completa = True
+        except TimeoutError:
+            self.completa = False
+        
+        # Reproducir la mejor solución en el bloque propio (si alguna pieza no
+        # entra, queda como no colocada)
+        colocadas = set()
+        for origen, orientacion, posicion in self._mejor:
+            if self.bloque.colocar_pieza(origen.orientada(orientacion), posicion):
+                colocadas.add(id(origen))
+        self.piezas_no_colocadas = [p for p in self._piezas if id(p) not in colocadas]
+        
+        reporte = self._generar_reporte()
+        reporte['nodos'] = self.nodos
+        reporte['completa'] = self.completa
+        reporte['tiempo'] = time.perf_counter() - inicio
+        return reporte
+    
+    def _cota(self, bloque: Bloque, i: int) -> float:
+        """Máximo volumen alcanzable desde este estado"""
+        libre = bloque.volumen_util - bloque.volumen_ocupado
+        return bloque.volumen_ocupado + min(self._restante[i], libre)
+    
+    def _explorar(self, bloque: Bloque, i: int, camino: List[Tuple]):
+        """Decide la pieza i y siguientes a partir del estado del bloque"""
+        self.nodos += 1
+        if self._limite is not None and time.perf_counter() > self._limite:
+            raise TimeoutError
+        
+        if bloque.volumen_ocupado > self._mejor_volumen:
+            self._mejor_volumen = bloque.volumen_ocupado
+            self._mejor = list(camino)
+        if i == len(self._piezas) or self._cota(bloque, i) <= self._mejor_volumen:
+            return
+        
+        # Mismas piezas pendientes y mismos huecos = mismo subproblema
+        clave = (i, np.sort(bloque.gestor_huecos.cajas).tobytes())
+        if self._visitados.get(clave, -1) >= bloque.volumen_ocupado:
+            return
+        self._visitados[clave] = bloque.volumen_ocupado
+        
+        pieza = self._piezas[i]
+        busqueda = Optimizador3D(bloque, self.criterio)
+        ramas = []
+        for orientacion, posicion, _ in busqueda._candidatos(pieza):
+            if self.max_ramas is not None and len(ramas) >= self.max_ramas:
+                break
+            ramas.append((orientacion, posicion))
+        
+        for orientacion, posicion in ramas:
+            hijo = bloque.copiar()
+            if hijo.colocar_pieza(pieza.orientada(orientacion), posicion):
+                camino.append((pieza, orientacion, posicion))
+                self._explorar(hijo, i + 1, camino)
+                camino.pop()
+        
+        # Rama sin colocar la pieza
+        self._explorar(bloque, i + 1, camino)
+
+# Estrategias de OptimizadorMultiBloque para elegir bloque
+ESTRATEGIAS_MULTIBLOQUE = ('primer_ajuste', 'mejor_ajuste', 'huecos')
+
+class OptimizadorMultiBloque:
+    """
+    Reparte las piezas entre bloques iguales, abriendo uno nuevo cuando la pieza
+    no cabe en ninguno de los abiertos.
+    
+    Estrategias para elegir bloque:
+        primer_ajuste: el primer bloque abierto donde cabe
+        mejor_ajuste: el bloque con menos volumen libre donde cabe
+        huecos: el bloque cuyo mejor hueco deja menos volumen sin usar
+    """
+    
+    def __init__(self, ancho: float, alto: float, profundidad: float,
+                 estrategia: str = 'primer_ajuste', criterio: str = 'z_minima',
+                 max_bloques: Optional[int] = None,
+                 restricciones: Optional[Restricciones] = None,
+                 gestor_huecos: str = 'maximales'):
+        if estrategia not in ESTRATEGIAS_MULTIBLOQUE:
+            raise ValueError(f"Estrategia desconocida: {estrategia} "
+                             f"(opciones: {', '.join(ESTRATEGIAS_MULTIBLOQUE)})")
+        self.dimensiones = (ancho, alto, profundidad)
+        self.estrategia = estrategia
+        self.criterio = criterio
+        self.max_bloques = max_bloques
+        self.restricciones = restricciones  # Comunes a todos los bloques
+        self.gestor_huecos = gestor_huecos
+        self.optimizadores = []  # Un Optimizador3D por bloque abierto
+        self.piezas_no_colocadas = []
+        self._lado_minimo = 0
+    
+    @property
+    def bloques(self) -> List[Bloque]:
+        """Bloques abiertos, en orden de apertura"""
+        return [optimizador.bloque for optimizador in self.optimizadores]
+    
+    def optimizar(self, piezas: List[Pieza]) -> Dict:
+        """Coloca las piezas (de mayor a menor volumen) abriendo bloques bajo demanda"""
+        piezas_ordenadas = sorted(piezas, key=lambda p: p.volumen, reverse=True)
+        if piezas_ordenadas:
+            self._lado_minimo = min(min(p.ancho, p.alto, p.profundidad) for p in piezas_ordenadas)
+        
+        for pieza in piezas_ordenadas:
+            if self._colocar_en_abiertos(pieza):
+                continue
+            if self.max_bloques is not None and len(self.optimizadores) >= self.max_bloques:
+                self.piezas_no_colocadas.append(pieza)
+                continue
+            # Si no cabe ni en un bloque vacío no merece la pena abrirlo
+            nuevo = self._abrir_bloque()
+            if not nuevo._colocar(pieza):
+                self.optimizadores.pop()
+                self.piezas_no_colocadas.append(pieza)
+        
+        return self._generar_reporte()
+    
+    def _abrir_bloque(self) -> Optimizador3D:
+        """Abre un bloque vacío con su propio índice espacial y gestor de huecos"""
+        optimizador = Optimizador3D(Bloque(*self.dimensiones, gestor_huecos=self.gestor_huecos,
+                                           restricciones=self.restricciones),
+                                    criterio=self.criterio)
+        optimizador.bloque.gestor_huecos.lado_minimo = self._lado_minimo
+        self.optimizadores.append(optimizador)
+        return optimizador
+    
+    def _colocar_en_abiertos(self, pieza: Pieza) -> bool:
+        """Intenta colocar la pieza en uno de los bloques ya abiertos"""
+        # Descartar de entrada los bloques sin volumen libre suficiente
+        posibles = [o for o in self.optimizadores
+                    if o.bloque.volumen_total - o.bloque.volumen_ocupado >= pieza.volumen]
         
-        ax.set_xlabel('Ancho (cm)')
-        ax.set_ylabel('Alto (cm)')
-        ax.set_zlabel('Profundidad (cm)')
-        ax.set_title('🧱 Optimización de Corte 3D - Resultado')
+        if self.estrategia == 'primer_ajuste':
+            return any(optimizador._colocar(pieza) for optimizador in posibles)
         
-        plt.tight_layout()
+        # mejor_ajuste y huecos puntúan el mejor candidato de cada bloque
+        puntuados = []
+        for optimizador in posibles:
+            candidato = next(optimizador._candidatos(pieza), None)
+            if candidato is None:
+                continue
+            if self.estrategia == 'mejor_ajuste':
+                bloque = optimizador.bloque
+                puntos = bloque.volumen_total - bloque.volumen_ocupado
+            else:
+                puntos = candidato[2] - pieza.volumen
+            puntuados.append((puntos, len(puntuados), optimizador))
+        
+        for _, _, optimizador in sorted(puntuados):
+            if optimizador._colocar(pieza):
+                return True
+        return False
+    
+    def _generar_reporte(self) -> Dict:
+        """Genera un reporte del reparto entre bloques"""
+        volumen_ocupado = sum(b.volumen_ocupado for b in self.bloques)
+        volumen_total = sum(b.volumen_total for b in self.bloques)
+        return {
+            'bloques_usados': len(self.optimizadores),
+            'piezas_colocadas': sum(len(b.piezas_colocadas) for b in self.bloques),
+            'piezas_no_colocadas': len(self.piezas_no_colocadas),
+            'eficiencia': (volumen_ocupado / volumen_total) * 100 if volumen_total else 0.0,
+            'eficiencia_bloques': [b.calcular_eficiencia() for b in self.bloques],
+            'volumen_ocupado': volumen_ocupado,
+            'volumen_total': volumen_total
+        }
+    
+    def visualizar(self, archivo: Optional[str] = None, max_etiquetas: int = 100):
+        """
+        Dibuja cada bloque usado (ver dibujar_bloque): en ventanas sucesivas o,
+        con archivo, uno por bloque con el número de bloque (desde 0) antes de
+        la extensión, p. ej. resultado_bloque0.png
+        """
+        base, extension = os.path.splitext(archivo) if archivo is not None else (None, '')
+        for i, bloque in enumerate(self.bloques):
+            dibujar_bloque(bloque, None if archivo is None else f"{base}_bloque{i}{extension}",
+                           max_etiquetas)
+
+def _pieza_a_tupla(pieza) -> Tuple:
+    """Convierte una pieza en una tupla ligera para enviarla a otro proceso"""
+    if isinstance(pieza, Pieza):
+        return (pieza.nombre, pieza.ancho, pieza.alto, pieza.profundidad, pieza.ejes_rotacion)
+    return tuple(pieza)
+
+def _limitar_memoria(memoria_max_mb: Optional[int]):
+    """Inicializador de cada proceso: limita su espacio de direcciones (solo Unix)"""
+    if not memoria_max_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        return  # Windows no tiene límites por proceso con resource
+    limite = memoria_max_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+
+def _optimizar_pedido(identificador, dims_bloque: Tuple[float, float, float],
+                      piezas: List[Tuple], criterio: str) -> Dict:
+    """Optimiza un pedido completo dentro de un proceso del lote"""
+    optimizador = Optimizador3D(Bloque(*dims_bloque), criterio=criterio)
+    resultado = optimizador.optimizar([Pieza(*datos) for datos in piezas])
+    resultado['pedido'] = identificador
+    resultado['colocaciones'] = optimizador.colocaciones()
+    resultado['no_colocadas'] = [pieza.nombre for pieza in optimizador.piezas_no_colocadas]
+    return resultado
+
+def optimizar_lote(pedidos: Iterable[Dict], workers: Optional[int] = None,
+                   memoria_max_mb: Optional[int] = None,
+                   tareas_por_worker: Optional[int] = None,
+                   criterio: str = 'z_minima') -> Iterator[Dict]:
+    """
+    Optimiza muchos pedidos en paralelo con un pool de procesos.
+    
+    Cada pedido es un diccionario con 'bloque' (ancho, alto, prof), 'piezas'
+    (objetos Pieza o tuplas (nombre, ancho, alto, prof[, ejes_rotacion])) y,
+    opcionalmente, 'id'. Los resultados se devuelven en cuanto termina cada
+    pedido, no en el orden de entrada: cada uno es el reporte de optimizar()
+    más 'pedido', 'colocaciones' y 'no_colocadas', o 'pedido' y 'error' si
+    ese pedido ha fallado.
+    
+    Args:
+        pedidos: Pedidos a optimizar
+        workers: Número de procesos (por defecto, uno por núcleo)
+        memoria_max_mb: Límite de memoria por proceso en MB (solo Unix)
+        tareas_por_worker: Pedidos que atiende cada proceso antes de reiniciarse,
+            para devolver al sistema la memoria acumulada (Python 3.11+)
+        criterio: Criterio de elección de hueco de Optimizador3D
+    """
+    opciones = {}
+    if tareas_por_worker:
+        opciones['max_tasks_per_child'] = tareas_por_worker
+    
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    with ProcessPoolExecutor(max_workers=workers, initializer=_limitar_memoria,
+                             initargs=(memoria_max_mb,), **opciones) as executor:
+        futuros = {}
+        for i, pedido in enumerate(pedidos):
+            identificador = pedido.get('id', i)
+            # Las piezas viajan como tuplas: se serializan mucho más rápido que objetos
+            piezas = [_pieza_a_tupla(pieza) for pieza in pedido['piezas']]
+            futuro = executor.submit(_optimizar_pedido, identificador,
+                                     tuple(pedido['bloque']), piezas, criterio)
+            futuros[futuro] = identificador
+        
+        for futuro in as_completed(futuros):
+            try:
+                yield futuro.result()
+            except Exception as e:
+                yield {'pedido': futuros[futuro], 'error': f"{type(e).__name__}: {e}"}
+
+# ---------------------------------------------------------------------------
+# Visualización
+#
+# Es la única parte que usa matplotlib, y se importa al dibujar por primera
+# vez: cargar matplotlib y mpl_toolkits cuesta cientos de milisegundos que los
+# trabajos por lotes y la línea de comandos no tienen por qué pagar. El núcleo
+# (Pieza, Bloque, Optimizador3D.optimizar) no depende de esta sección.
+# ---------------------------------------------------------------------------
+
+def _matplotlib(interactivo: bool):
+    """
+    Importa lo necesario para dibujar y devuelve
+    (Figure, Poly3DCollection, pyplot). pyplot solo se carga si hay que abrir
+    una ventana; para guardar a fichero basta con Figure.
+    """
+    from matplotlib.figure import Figure
+    from mpl_toolkits.mplot3d import Axes3D  # Registra la proyección '3d'
+    from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+    plt = None
+    if interactivo:
+        import matplotlib.pyplot as plt
+    return Figure, Poly3DCollection, plt
+
+# Caras de una caja unidad: 6 caras x 4 esquinas (x, y, z), en sentido antihorario
+# visto desde fuera
+_CARAS_CAJA = np.array([
+    [(0, 0, 0), (0, 1, 0), (1, 1, 0), (1, 0, 0)],  # z = 0
+    [(0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)],  # z = 1
+    [(0, 0, 0), (1, 0, 0), (1, 0, 1), (0, 0, 1)],  # y = 0
+    [(0, 1, 0), (0, 1, 1), (1, 1, 1), (1, 1, 0)],  # y = 1
+    [(0, 0, 0), (0, 0, 1), (0, 1, 1), (0, 1, 0)],  # x = 0
+    [(1, 0, 0), (1, 1, 0), (1, 1, 1), (1, 0, 1)],  # x = 1
+], dtype=np.float64)
+
+def _caras_cajas(origenes: np.ndarray, dimensiones: np.ndarray) -> np.ndarray:
+    """Vértices de las caras de n cajas como array (n, 6, 4, 3), sin bucles en Python"""
+    return origenes[:, None, None, :] + _CARAS_CAJA[None] * dimensiones[:, None, None, :]
+
+def dibujar_bloque(bloque: Bloque, archivo: Optional[str] = None, max_etiquetas: int = 100):
+    """
+    Crea una visualización 3D de un bloque y sus piezas colocadas
+    
+    Todas las piezas se dibujan como una única colección de polígonos, así
+    que miles de piezas se renderizan en segundos.
+    
+    Args:
+        bloque: Bloque a dibujar
+        archivo: Si se indica, se guarda la imagen (PNG, SVG, PDF...) sin
+            abrir ninguna ventana; con extensión .obj se exporta la malla
+        max_etiquetas: Número máximo de nombres a dibujar; si hay más
+            piezas solo se etiquetan las de mayor volumen
+    """
+    if archivo is not None and archivo.lower().endswith('.obj'):
+        exportar_obj(bloque, archivo)
+        return
+    
+    Figure, Poly3DCollection, plt = _matplotlib(interactivo=archivo is None)
+    
+    # Sin pyplot no hace falta pantalla ni backend interactivo
+    fig = plt.figure(figsize=(12, 8)) if archivo is None else Figure(figsize=(12, 8))
+    ax = fig.add_subplot(111, projection='3d')
+    
+    # Dibujar el bloque
+    dims_bloque = np.array([[bloque.ancho, bloque.alto, bloque.profundidad]],
+                           dtype=np.float64)
+    ax.add_collection3d(Poly3DCollection(_caras_cajas(np.zeros((1, 3)), dims_bloque)[0],
+                                         facecolors=(0.5, 0.5, 0.5, 0.1),
+                                         edgecolors='black', linewidths=0.8))
+    
+    # Dibujar las piezas colocadas
+    piezas = bloque.piezas_colocadas
+    if piezas:
+        origenes = np.array([p.posicion for p in piezas], dtype=np.float64)
+        dimensiones = np.array([(p.ancho, p.alto, p.profundidad) for p in piezas],
+                               dtype=np.float64)
+        colores = np.array([p.color for p in piezas], dtype=np.float64)
+        colores[:, 3] = 0.8
+        caras = _caras_cajas(origenes, dimensiones).reshape(-1, 4, 3)
+        ax.add_collection3d(Poly3DCollection(caras, facecolors=np.repeat(colores, 6, axis=0),
+                                             edgecolors='black',
+                                             linewidths=0.5 if len(piezas) <= 1000 else 0.1))
+    
+        # Etiquetas de las piezas (solo las mayores si hay muchas)
+        centros = origenes + dimensiones / 2
+        volumenes = dimensiones.prod(axis=1)
+        for i in np.argsort(-volumenes, kind='stable')[:max_etiquetas]:
+            ax.text(*centros[i], piezas[i].nombre, fontsize=8, ha='center')
+    
+    ax.set_xlim(0, bloque.ancho)
+    ax.set_ylim(0, bloque.alto)
+    ax.set_zlim(0, bloque.profundidad)
+    ax.set_xlabel('Ancho (cm)')
+    ax.set_ylabel('Alto (cm)')
+    ax.set_zlabel('Profundidad (cm)')
+    ax.set_title('🧱 Optimización de Corte 3D - Resultado')
+    
+    fig.tight_layout()
+    if archivo is None:
         plt.show()
+    else:
+        fig.savefig(archivo, dpi=150)
+
+def exportar_obj(bloque: Bloque, archivo: str):
+    """Exporta el bloque y sus piezas colocadas como malla Wavefront OBJ (un objeto por pieza)"""
+    piezas = bloque.piezas_colocadas
+    origenes = np.array([(0, 0, 0)] + [p.posicion for p in piezas], dtype=np.float64)
+    dimensiones = np.array([(bloque.ancho, bloque.alto, bloque.profundidad)] +
+                           [(p.ancho, p.alto, p.profundidad) for p in piezas], dtype=np.float64)
+    # Las 8 esquinas de cada caja, en el orden de los bits (x, y, z)
+    esquinas = np.array([(i & 1, (i >> 1) & 1, (i >> 2) & 1) for i in range(8)], dtype=np.float64)
+    vertices = (origenes[:, None, :] + esquinas[None] * dimensiones[:, None, :]).reshape(-1, 3)
+    # Índices (base 1) de las esquinas de cada cara de _CARAS_CAJA
+    caras = (_CARAS_CAJA @ np.array([1, 2, 4])).astype(int) + 1
+    
+    nombres = ['bloque'] + [p.nombre for p in piezas]
+    with open(archivo, 'w', encoding='utf-8') as f:
+        f.write("# Optimizador de Corte 3D\n")
+        f.write(''.join(f"v {x:g} {y:g} {z:g}\n" for x, y, z in vertices.tolist()))
+        for i, nombre in enumerate(nombres):
+            f.write(f"o {nombre}\n")
+            f.write(''.join(f"f {a} {b} {c} {d}\n" for a, b, c, d in (caras + 8 * i).tolist()))
+
+# Formato de fichero de piezas o colocaciones según la extensión
+FORMATOS_ARCHIVO = {
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.csv': 'csv',
+}
+
+def _formato_archivo(archivo, formato: Optional[str]) -> str:
+    """Formato indicado o, si no, el que corresponde a la extensión del fichero"""
+    if formato is None:
+        if not isinstance(archivo, (str, os.PathLike)):
+            return 'ndjson'
+        formato = FORMATOS_ARCHIVO.get(os.path.splitext(os.fspath(archivo))[1].lower())
+        if formato is None:
+            raise ValueError(f"No se reconoce el formato de {archivo} "
+                             f"(extensiones: {', '.join(FORMATOS_ARCHIVO)})")
+    elif formato not in set(FORMATOS_ARCHIVO.values()):
+        raise ValueError(f"Formato desconocido: {formato} "
+                         f"(opciones: {', '.join(sorted(set(FORMATOS_ARCHIVO.values())))})")
+    return formato
+
+@contextmanager
+def _abrir(archivo, modo: str):
+    """Abre una ruta (y la cierra al terminar) o usa tal cual un objeto fichero ya abierto"""
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, modo, encoding='utf-8', newline='') as f:
+            yield f
+    else:
+        yield archivo
+
+def _piezas_de_registro(registro: Dict, linea: int) -> Iterator[Pieza]:
+    """Piezas descritas por un registro; 'cantidad' repite la pieza con sufijos _1, _2..."""
+    try:
+        nombre = str(registro['nombre'])
+        dims = [float(registro[campo]) for campo in ('ancho', 'alto', 'profundidad')]
+        ejes = registro.get('ejes_rotacion')
+        ejes = 'xyz' if ejes is None else str(ejes)
+        cantidad = registro.get('cantidad')
+        cantidad = 1 if cantidad in (None, '') else int(cantidad)
+        if cantidad == 1:
+            yield Pieza(nombre, *dims, ejes_rotacion=ejes)
+            return
+        for i in range(cantidad):
+            yield Pieza(f"{nombre}_{i + 1}", *dims, ejes_rotacion=ejes)
+    except (KeyError, ValueError, TypeError) as e:
+        raise ValueError(f"Línea {linea}: pieza no válida ({type(e).__name__}: {e})") from e
+
+def leer_piezas(archivo, formato: Optional[str] = None) -> Iterator[Pieza]:
+    """
+    Lee piezas de un fichero NDJSON o CSV sin cargarlo entero en memoria.
+    
+    Cada registro tiene nombre, ancho, alto y profundidad, y opcionalmente
+    ejes_rotacion (por defecto 'xyz') y cantidad. En CSV la primera fila es la
+    cabecera con esos nombres de columna.
+    
+    Args:
+        archivo: Ruta o fichero de texto ya abierto
+        formato: 'ndjson' o 'csv'; por defecto se deduce de la extensión
+    """
+    formato = _formato_archivo(archivo, formato)
+    with _abrir(archivo, 'r') as f:
+        if formato == 'csv':
+            # La fila 1 es la cabecera
+            for linea, registro in enumerate(csv.DictReader(f), start=2):
+                yield from _piezas_de_registro(registro, linea)
+        else:
+            for linea, texto in enumerate(f, start=1):
+                if not texto.strip():
+                    continue
+                try:
+                    registro = json.loads(texto)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Línea {linea}: JSON no válido ({e})") from e
+                yield from _piezas_de_registro(registro, linea)
+
+class EscritorColocaciones:
+    """
+    Escribe cada colocación (nombre, orientación, dimensiones y posición) en
+    cuanto el bloque la confirma, en NDJSON o CSV, vaciando el búfer en cada
+    línea para que quien lea el fichero (p. ej. la máquina de corte) pueda
+    empezar con las primeras piezas.
+    
+    Uso:
+        with EscritorColocaciones('colocaciones.ndjson') as escritor:
+            bloque.al_colocar.append(escritor)
+            Optimizador3D(bloque).optimizar(leer_piezas('pedido.ndjson'), ordenar=False)
+    """
+    
+    COLUMNAS_CSV = ('nombre', 'orientacion', 'ancho', 'alto', 'profundidad', 'x', 'y', 'z')
+    
+    def __init__(self, archivo, formato: Optional[str] = None, con_bloque: bool = False):
+        """
+        Args:
+            archivo: Ruta o fichero de texto ya abierto
+            formato: 'ndjson' o 'csv'; por defecto se deduce de la extensión
+            con_bloque: Añadir el número de bloque a cada colocación
+                (para OptimizadorMultiBloque)
+        """
+        self.formato = _formato_archivo(archivo, formato)
+        self.con_bloque = con_bloque
+        self._contexto = _abrir(archivo, 'w')
+        self._archivo = self._contexto.__enter__()
+        self._csv = None
+        if self.formato == 'csv':
+            self._csv = csv.writer(self._archivo)
+            self._csv.writerow(self.COLUMNAS_CSV + (('bloque',) if con_bloque else ()))
+        self.escritas = 0
+    
+    def __call__(self, pieza: Pieza, bloque: int = 0):
+        colocacion = _colocacion(pieza)
+        if self.con_bloque:
+            colocacion['bloque'] = bloque
+        if self._csv is not None:
+            self._csv.writerow([colocacion['nombre'], colocacion['orientacion'],
+                                *colocacion['dimensiones'], *colocacion['posicion']] +
+                               ([bloque] if self.con_bloque else []))
+        else:
+            self._archivo.write(json.dumps(colocacion, ensure_ascii=False) + '\n')
+        self._archivo.flush()
+        self.escritas += 1
+    
+    def cerrar(self):
+        """Cierra el fichero si lo abrió el escritor"""
+        self._contexto.__exit__(None, None, None)
+    
+    def __enter__(self) -> 'EscritorColocaciones':
+        return self
+    
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+class CacheColocaciones:
+    """
+    Caché persistente (SQLite) de soluciones de Optimizador3D.optimizar.
+    
+    La clave es un hash del bloque (medidas, restricciones y gestor de huecos),
+    de los ajustes del optimizador y del multiconjunto de piezas. Las piezas se
+    identifican por sus medidas y ejes de giro (y por el nombre solo si tienen
+    bloqueo de orientación), así que el mismo pedido en otro orden o con otros
+    nombres reutiliza la solución; con ordenar=False el orden forma parte de la
+    clave. Al acertar, las colocaciones guardadas se asignan a las piezas de la
+    entrada que tienen las mismas medidas.
+    
+    Se guardan como mucho max_entradas soluciones: al superarlo se descartan
+    las usadas hace más tiempo (LRU). Varios procesos pueden compartir el
+    fichero.
+    
+    Uso:
+        with CacheColocaciones('colocaciones.sqlite') as cache:
+            Optimizador3D(Bloque(200, 118, 180), cache=cache).optimizar(piezas)
+    """
+    
+    VERSION = 1  # Cambia si cambia el formato de la clave o de las soluciones
+    
+    def __init__(self, archivo: str, max_entradas: int = 1000):
+        """
+        Args:
+            archivo: Fichero SQLite (se crea si no existe)
+            max_entradas: Número máximo de soluciones guardadas
+        """
+        import sqlite3  # Solo si se usa la caché
+        if max_entradas < 1:
+            raise ValueError(f"max_entradas debe ser al menos 1: {max_entradas}")
+        self.archivo = archivo
+        self.max_entradas = max_entradas
+        self.aciertos = 0
+        self.fallos = 0
+        self._conexion = sqlite3.connect(archivo, timeout=30)
+        with self._conexion:
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS colocaciones ("
+                "clave TEXT PRIMARY KEY, solucion TEXT NOT NULL, usado REAL NOT NULL)")
+    
+    def clave(self, optimizador: 'Optimizador3D', piezas: List[Pieza],
+              ordenar: bool = True) -> Tuple[str, List[int]]:
+        """
+        Clave del pedido y orden canónico de las piezas (índices de la entrada)
+        al que se refieren las soluciones guardadas
+        """
+        import hashlib  # Solo si se usa la caché
+        bloque = optimizador.bloque
+        restricciones = bloque.restricciones
+        canonicas = [(float(p.ancho), float(p.alto), float(p.profundidad), p.ejes_rotacion,
+                      p.nombre if p.nombre in restricciones.orientaciones else '')
+                     for p in piezas]
+        orden = list(range(len(piezas)))
+        if ordenar:
+            orden.sort(key=canonicas.__getitem__)
+        datos = {
+            'version': self.VERSION,
+            'optimizador': type(optimizador).__name__,
+            'criterio': optimizador.criterio,
+            'ordenar': ordenar,
+            'bloque': [float(bloque.ancho), float(bloque.alto), float(bloque.profundidad)],
+            'gestor_huecos': _nombre_gestor(bloque.gestor_huecos) or type(bloque.gestor_huecos).__name__,
+            'altura_maxima': restricciones.altura_maxima,
+            'kerf': float(restricciones.kerf),
+            'zonas': [[float(v) for v in zona] for zona in restricciones.zonas_prohibidas],
+            'orientaciones': sorted(restricciones.orientaciones.items()),
+            'piezas': [canonicas[i] for i in orden],
+        }
+        texto = json.dumps(datos, separators=(',', ':'))
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest(), orden
+    
+    def obtener(self, clave: str) -> Optional[Dict]:
+        """Solución guardada para la clave (None si no hay) y la marca como usada"""
+        fila = self._conexion.execute(
+            "SELECT solucion FROM colocaciones WHERE clave = ?", (clave,)).fetchone()
+        if fila is None:
+            self.fallos += 1
+            return None
+        with self._conexion:
+            self._conexion.execute(
+                "UPDATE colocaciones SET usado = ? WHERE clave = ?", (time.time(), clave))
+        self.aciertos += 1
+        return json.loads(fila[0])
+    
+    def guardar(self, clave: str, solucion: Dict):
+        """Guarda una solución y descarta las menos usadas por encima de max_entradas"""
+        with self._conexion:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO colocaciones VALUES (?, ?, ?)",
+                (clave, json.dumps(solucion, separators=(',', ':')), time.time()))
+            self._conexion.execute(
+                "DELETE FROM colocaciones WHERE clave NOT IN "
+                "(SELECT clave FROM colocaciones ORDER BY usado DESC LIMIT ?)",
+                (self.max_entradas,))
+    
+    def __len__(self) -> int:
+        return self._conexion.execute("SELECT COUNT(*) FROM colocaciones").fetchone()[0]
+    
+    def cerrar(self):
+        """Cierra la conexión con el fichero"""
+        self._conexion.close()
+    
+    def __enter__(self) -> 'CacheColocaciones':
+        return self
+    
+    def __exit__(self, *excepcion):
+        self.cerrar()
 
 def cargar_piezas_ejemplo() -> List[Pieza]:
     """Carga un conjunto de piezas de ejemplo"""
@@ -257,62 +2586,243 @@ def cargar_piezas_ejemplo() -> List[Pieza]:
     
     return piezas
 
-def main():
-    """Función principal"""
-    print("🧱 Optimizador de Corte 3D para Bloques de Espuma")
-    print("=" * 50)
-    print("Autor: Marc RoMa-88 (@RoMa-88)")
-    print()
-    
-    # Crear bloque de ejemplo (118x200x180 cm)
-    bloque = Bloque(200, 118, 180)
-    print(f"📦 Bloque creado: {bloque.ancho}x{bloque.alto}x{bloque.profundidad} cm")
-    print(f"📊 Volumen total: {bloque.volumen_total:,.0f} cm³")
-    print()
-    
-    # Cargar piezas
-    piezas = cargar_piezas_ejemplo()
-    print(f"🧩 Piezas a optimizar: {len(piezas)}")
-    
-    # Mostrar piezas
-    print("\n📋 Lista de piezas:")
-    for pieza in piezas:
-        print(f"  • {pieza.nombre}: {pieza.ancho}x{pieza.alto}x{pieza.profundidad} cm "
-              f"(vol: {pieza.volumen:,.0f} cm³)")
-    
-    print("\n🚀 Iniciando optimización...")
-    
-    # Optimizar
-    optimizador = Optimizador3D(bloque)
-    resultado = optimizador.optimizar(piezas)
-    
-    # Mostrar resultados
-    print("\n📊 RESULTADOS DE LA OPTIMIZACIÓN")
-    print("=" * 40)
-    print(f"✅ Piezas colocadas: {resultado['piezas_colocadas']}")
-    print(f"❌ Piezas no colocadas: {resultado['piezas_no_colocadas']}")
-    print(f"📈 Eficiencia: {resultado['eficiencia']:.1f}%")
-    print(f"📦 Volumen ocupado: {resultado['volumen_ocupado']:,.0f} cm³")
-    print(f"📦 Volumen total: {resultado['volumen_total']:,.0f} cm³")
-    
-    # Mostrar piezas no colocadas
-    if optimizador.piezas_no_colocadas:
-        print("\n❌ Piezas que no pudieron colocarse:")
-        for pieza in optimizador.piezas_no_colocadas:
-            print(f"  • {pieza.nombre}: {pieza.ancho}x{pieza.alto}x{pieza.profundidad} cm")
-    
-    # Visualizar
-    print("\n🎨 Generando visualización 3D...")
-    optimizador.visualizar()
-    
-    print("\n✅ Optimización completada!")
-    print("💡 Mejoras futuras: algoritmos genéticos, backtracking, etc.")
+# Códigos de salida de la línea de comandos
+SALIDA_OK = 0            # Todas las piezas colocadas
+SALIDA_ERROR = 1         # Error inesperado
+SALIDA_ARGUMENTOS = 2    # Argumentos no válidos (el código que usa argparse)
+SALIDA_ENTRADA = 3       # Fichero de piezas inexistente o con registros no válidos
+SALIDA_INCOMPLETA = 4    # Optimización correcta, pero quedaron piezas sin colocar
+SALIDA_ESCRITURA = 5     # No se pudo escribir un fichero de salida (-s, --cortes, --visualizar)
+SALIDA_INTERRUMPIDA = 130  # Ctrl+C
+
+class _ErrorEntrada(Exception):
+    """Fichero de piezas inexistente o no válido (SALIDA_ENTRADA)"""
+
+class _ErrorEscritura(Exception):
+    """Fichero de salida que no se puede escribir (SALIDA_ESCRITURA)"""
+
+def _leer_entrada(archivo) -> Iterator[Pieza]:
+    """leer_piezas con los errores del fichero como _ErrorEntrada, también al leer en streaming"""
+    try:
+        yield from leer_piezas(archivo)
+    except (OSError, ValueError) as e:
+        raise _ErrorEntrada(str(e)) from e
+
+@contextmanager
+def _escribiendo(archivo: str):
+    """Convierte los errores de E/S al escribir `archivo` en _ErrorEscritura"""
+    try:
+        yield
+    except OSError as e:
+        raise _ErrorEscritura(f"{archivo}: {e}") from e
+
+# Algoritmos disponibles en la línea de comandos
+ALGORITMOS = ('greedy', 'genetico', 'multiarranque', 'exacto', 'multibloque')
+
+def _crear_optimizador(args: argparse.Namespace):
+    """Optimizador del algoritmo elegido con las opciones de la línea de comandos"""
+    restricciones = Restricciones(altura_maxima=args.altura_maxima, kerf=args.kerf,
+                                  zonas_prohibidas=args.zona or ())
+    if args.algoritmo == 'multibloque':
+        return OptimizadorMultiBloque(*args.bloque, criterio=args.criterio,
+                                      restricciones=restricciones, gestor_huecos=args.gestor_huecos)
+    bloque = Bloque(*args.bloque, gestor_huecos=args.gestor_huecos, restricciones=restricciones)
+    if args.algoritmo == 'genetico':
+        return OptimizadorGenetico(bloque, args.criterio, tiempo_max=args.tiempo_max,
+                                   workers=args.workers, semilla=args.semilla)
+    if args.algoritmo == 'multiarranque':
+        return OptimizadorMultiArranque(bloque, args.criterio, arranques=args.arranques,
+                                        eficiencia_objetivo=args.objetivo,
+                                        tiempo_max=args.tiempo_max, workers=args.workers,
+                                        semilla=args.semilla)
+    if args.algoritmo == 'exacto':
+        return OptimizadorExacto(bloque, args.criterio, tiempo_max=args.tiempo_max)
+    cache = CacheColocaciones(args.cache, args.cache_max) if args.cache else None
+    return Optimizador3D(bloque, args.criterio, cache=cache)
+
+def _rango(tipo, minimo, estricto: bool = False, maximo=None):
+    """Tipo de argparse que convierte con `tipo` y exige un valor >= minimo (> con estricto) y <= maximo"""
+    def convertir(texto: str):
+        valor = tipo(texto)
+        if valor < minimo or (estricto and valor == minimo) or (maximo is not None and valor > maximo):
+            limite = f"{'>' if estricto else '>='} {minimo}" + (f" y <= {maximo}" if maximo is not None else '')
+            raise argparse.ArgumentTypeError(f"debe ser {limite}: {texto}")
+        return valor
+    convertir.__name__ = tipo.__name__  # Para los mensajes de argparse
+    return convertir
+
+_POSITIVO = _rango(float, 0, estricto=True)
+_NO_NEGATIVO = _rango(float, 0)
+_ENTERO_POSITIVO = _rango(int, 1)
+
+def _argumentos() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Optimizador de corte 3D para bloques de espuma",
+        epilog=f"Códigos de salida: {SALIDA_OK} todo colocado, {SALIDA_ERROR} error inesperado, "
+               f"{SALIDA_ARGUMENTOS} argumentos no válidos, {SALIDA_ENTRADA} entrada no válida, "
+               f"{SALIDA_INCOMPLETA} quedaron piezas sin colocar, "
+               f"{SALIDA_ESCRITURA} no se pudo escribir la salida, "
+               f"{SALIDA_INTERRUMPIDA} interrumpido.")
+    parser.add_argument('--bloque', nargs=3, type=_POSITIVO, default=[200, 118, 180],
+                        metavar=('ANCHO', 'ALTO', 'PROF'), help='dimensiones del bloque en cm')
+    parser.add_argument('--altura-maxima', type=_POSITIVO, default=150,
+                        help='altura máxima de corte de la máquina en cm (por defecto 150)')
+    parser.add_argument('--kerf', type=_NO_NEGATIVO, default=0, help='ancho de la hoja en cm')
+    parser.add_argument('--zona', nargs=6, type=_NO_NEGATIVO, action='append',
+                        metavar=('X', 'Y', 'Z', 'ANCHO', 'ALTO', 'PROF'),
+                        help='zona prohibida del bloque (se puede repetir)')
+    parser.add_argument('-e', '--entrada', help='piezas en NDJSON o CSV (por defecto, el ejemplo)')
+    parser.add_argument('-s', '--salida', help='colocaciones en NDJSON o CSV, según la extensión')
+    parser.add_argument('-a', '--algoritmo', choices=ALGORITMOS, default='greedy')
+    parser.add_argument('--criterio', choices=list(CRITERIOS_HUECO), default='z_minima')
+    parser.add_argument('--gestor-huecos', choices=list(GESTORES_HUECOS), default='maximales',
+                        help="gestión del espacio libre ('guillotina': solo cortes de lado a lado)")
+    parser.add_argument('-t', '--tiempo-max', type=_POSITIVO, default=None,
+                        help='segundos como máximo (genetico, multiarranque, exacto)')
+    parser.add_argument('-w', '--workers', type=_ENTERO_POSITIVO, default=None,
+                        help='procesos para evaluar (genetico, multiarranque)')
+    parser.add_argument('--arranques', type=_ENTERO_POSITIVO, default=32,
+                        help='arranques del greedy aleatorizado (multiarranque)')
+    parser.add_argument('--objetivo', type=_rango(float, 0, maximo=100), default=None,
+                        metavar='EFICIENCIA',
+                        help='parar al alcanzar esta eficiencia en %% (multiarranque)')
+    parser.add_argument('--semilla', type=int, default=None, help='semilla aleatoria')
+    parser.add_argument('--sin-ordenar', action='store_true',
+                        help='colocar en el orden de entrada leyendo el fichero en streaming (greedy)')
+    parser.add_argument('--cache', metavar='ARCHIVO',
+                        help='reutilizar soluciones de pedidos repetidos guardadas en ARCHIVO (greedy)')
+    parser.add_argument('--cache-max', type=_ENTERO_POSITIVO, default=1000, metavar='N',
+                        help='soluciones que guarda la caché como mucho (por defecto 1000)')
+    parser.add_argument('--json', action='store_true',
+                        help='imprimir solo el reporte como JSON en la salida estándar')
+    parser.add_argument('--cortes', metavar='ARCHIVO',
+                        help='guardar la secuencia de cortes en NDJSON (requiere --gestor-huecos guillotina)')
+    parser.add_argument('--visualizar', nargs='?', const='', metavar='ARCHIVO',
+                        help='mostrar el resultado en 3D, o guardarlo en ARCHIVO (PNG, SVG, OBJ...); '
+                             'con multibloque, un archivo por bloque (ARCHIVO_bloque0.png...)')
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Función principal: devuelve el código de salida"""
+    parser = _argumentos()
+    args = parser.parse_args(argv)
+    if args.cortes and args.gestor_huecos != 'guillotina':
+        parser.error("--cortes requiere --gestor-huecos guillotina")
+    # Las combinaciones que solo se validan al construir el optimizador
+    # (p. ej. zonas prohibidas vacías) también son argumentos no válidos
+    try:
+        optimizador = _crear_optimizador(args)
+    except ValueError as e:
+        parser.error(str(e))
+    informar = (lambda *a, **k: None) if args.json else print
+    
+    if args.semilla is not None:
+        random.seed(args.semilla)
+    
+    informar("🧱 Optimizador de Corte 3D para Bloques de Espuma")
+    informar("=" * 50)
+    informar("Autor: Marc RoMa-88 (@RoMa-88)")
+    informar()
+    
+    ancho, alto, profundidad = args.bloque
+    informar(f"📦 Bloque: {ancho:g}x{alto:g}x{profundidad:g} cm")
+    informar(f"📊 Volumen total: {ancho * alto * profundidad:,.0f} cm³")
+    informar()
+    
+    # Cargar piezas (en streaming solo si se colocan en el orden de llegada)
+    if args.entrada is None:
+        piezas = cargar_piezas_ejemplo()
+    elif args.sin_ordenar and args.algoritmo == 'greedy' and not args.cache:
+        piezas = _leer_entrada(args.entrada)
+    else:
+        piezas = list(_leer_entrada(args.entrada))
+    if isinstance(piezas, list):
+        informar(f"🧩 Piezas a optimizar: {len(piezas)}")
+    
+    escritor = None
+    if args.salida:
+        with _escribiendo(args.salida):
+            escritor = EscritorColocaciones(args.salida, con_bloque=args.algoritmo == 'multibloque')
+        
+        def escribir(pieza, **opciones):
+            with _escribiendo(args.salida):
+                escritor(pieza, **opciones)
+        
+        if args.algoritmo != 'multibloque':
+            optimizador.bloque.al_colocar.append(escribir)
+    
+    informar("\n🚀 Iniciando optimización...")
+    try:
+        if args.algoritmo == 'greedy':
+            resultado = optimizador.optimizar(piezas, ordenar=not args.sin_ordenar)
+        else:
+            resultado = optimizador.optimizar(piezas)
+        if escritor is not None and args.algoritmo == 'multibloque':
+            for i, bloque in enumerate(optimizador.bloques):
+                for pieza in bloque.piezas_colocadas:
+                    escribir(pieza, bloque=i)
+    finally:
+        if escritor is not None:
+            with _escribiendo(args.salida):
+                escritor.cerrar()
+        if getattr(optimizador, 'cache', None) is not None:
+            optimizador.cache.cerrar()
+    
+    if args.json:
+        print(json.dumps(resultado, ensure_ascii=False))
+    else:
+        print("\n📊 RESULTADOS DE LA OPTIMIZACIÓN")
+        print("=" * 40)
+        print(f"✅ Piezas colocadas: {resultado['piezas_colocadas']}")
+        print(f"❌ Piezas no colocadas: {resultado['piezas_no_colocadas']}")
+        print(f"📈 Eficiencia: {resultado['eficiencia']:.1f}%")
+        print(f"📦 Volumen ocupado: {resultado['volumen_ocupado']:,.0f} cm³")
+        print(f"📦 Volumen total: {resultado['volumen_total']:,.0f} cm³")
+        if 'bloques_usados' in resultado:
+            print(f"🧱 Bloques usados: {resultado['bloques_usados']}")
+        if resultado.get('desde_cache'):
+            print("♻️  Solución recuperada de la caché")
+        
+        # Mostrar piezas no colocadas
+        if optimizador.piezas_no_colocadas:
+            print("\n❌ Piezas que no pudieron colocarse:")
+            for pieza in optimizador.piezas_no_colocadas:
+                print(f"  • {pieza.nombre}: {pieza.ancho}x{pieza.alto}x{pieza.profundidad} cm")
+    
+    bloques = optimizador.bloques if args.algoritmo == 'multibloque' else [optimizador.bloque]
+    if args.cortes:
+        with _escribiendo(args.cortes), open(args.cortes, 'w', encoding='utf-8') as f:
+            for i, bloque in enumerate(bloques):
+                for corte in bloque.secuencia_cortes():
+                    if args.algoritmo == 'multibloque':
+                        corte['bloque'] = i
+                    f.write(json.dumps(corte) + '\n')
+        informar(f"🪚 Secuencia de cortes guardada en {args.cortes}")
+    
+    if args.visualizar is not None and bloques:
+        informar("\n🎨 Generando visualización 3D...")
+        with _escribiendo(args.visualizar or 'visualización'):
+            optimizador.visualizar(args.visualizar or None)
+    
+    informar("\n✅ Optimización completada!")
+    return SALIDA_INCOMPLETA if resultado['piezas_no_colocadas'] else SALIDA_OK
 
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(main())
     except KeyboardInterrupt:
-        print("\n\n⏹️  Optimización interrumpida por el usuario")
+        print("\n\n⏹️  Optimización interrumpida por el usuario", file=sys.stderr)
+        sys.exit(SALIDA_INTERRUMPIDA)
+    except _ErrorEntrada as e:
+        print(f"\n❌ Entrada no válida: {e}", file=sys.stderr)
+        sys.exit(SALIDA_ENTRADA)
+    except _ErrorEscritura as e:
+        print(f"\n❌ No se pudo escribir la salida: {e}", file=sys.stderr)
+        sys.exit(SALIDA_ESCRITURA)
+    except ImportError as e:
+        print(f"\n❌ Falta una dependencia: {e}", file=sys.stderr)
+        print("💡 Para visualizar hace falta matplotlib: pip install matplotlib", file=sys.stderr)
+        sys.exit(SALIDA_ERROR)
     except Exception as e:
-        print(f"\n❌ Error inesperado: {e}")
-        print("💡 Asegúrate de tener matplotlib instalado: pip install matplotlib")
+        print(f"\n❌ Error inesperado: {e}", file=sys.stderr)
+        sys.exit(SALIDA_ERROR)